@@ -11,11 +11,13 @@ class Settings(BaseSettings):
     PORT: int = 3001
     HOST: str = "0.0.0.0"
     ENVIRONMENT: str = "development"
+    LOG_LEVEL: str = "INFO"  # set WARNING in production to quiet the chat path
     
     # Security
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRES_IN: int = 86400  # 24 hours
+    OTP_HMAC_KEY: str = ""  # Falls back to JWT_SECRET when unset
     
     # Database
     MONGODB_URI: str = "mongodb://localhost:27017"
@@ -24,6 +26,9 @@ class Settings(BaseSettings):
     # CORS
     CORS_ORIGINS: str = "http://localhost:3000"
     
+    # Serve /uploads from this process (disable in prod behind nginx/CDN)
+    SERVE_UPLOADS_LOCAL: bool = True
+    
     # AI
     GEMINI_API_KEY: str
     OPENAI_API_KEY: Optional[str] = None
@@ -45,13 +45,27 @@ class Database:
     
     async def connect(self, uri: str, db_name: str):
         """Connect to MongoDB and initialize collections"""
+        if self.client is not None:
+            # Already connected - the pool lives for the process lifetime
+            return True
         try:
-            self.client = AsyncIOMotorClient(uri)
+            # Explicit pool sizing: a warm floor of connections avoids the
+            # cold-pool stampede on a traffic burst, idle ones are trimmed
+            # after a minute, and a short server-selection timeout fails
+            # fast when MongoDB is down instead of hanging requests for 30s
+            self.client = AsyncIOMotorClient(
+                uri,
+                maxPoolSize=50,
+                minPoolSize=10,
+                maxIdleTimeMS=60000,
+                serverSelectionTimeoutMS=3000,
+            )
             self.db = self.client[db_name]
-            
+
             # Test connection
             await self.client.admin.command('ping')
-            logger.info(f"✅ Connected to MongoDB: {db_name}")
+            pool = self.client.options.pool_options
+            logger.info(f"✅ Connected to MongoDB: {db_name} (pool {pool.min_pool_size}-{pool.max_pool_size})")
             
             # Initialize collection references
             self.users = self.db.users
@@ -70,6 +84,10 @@ class Database:
             return True
         except Exception as e:
             logger.error(f"❌ MongoDB connection failed: {str(e)}")
+            if self.client is not None:
+                self.client.close()
+            self.client = None
+            self.db = None
             raise
     
     async def close(self):
@@ -128,6 +146,7 @@ async def create_indexes():
         
         # Announcements collection
         await db.announcements.create_index([("createdAt", -1)])
+        await db.announcements.create_index([("date", -1)])  # chat context sort
         await db.announcements.create_index("category")
         await db.announcements.create_index("priority")
         
@@ -162,6 +181,12 @@ async def create_indexes():
         await db.knowledge_base.create_index("category")
         await db.knowledge_base.create_index([("createdAt", -1)])
         
+        # OTP / password reset codes (hash-match verification path)
+        await db.otps.create_index([("user_id", 1), ("purpose", 1), ("otp_hash", 1)])
+        await db.otps.create_index("expires_at")
+        await db.password_resets.create_index([("email", 1), ("reset_hash", 1)])
+        await db.password_resets.create_index("expires_at")
+        
         # ML training data
         await db.mlTrainingData.create_index("category")
         await db.mlTrainingData.create_index([("createdAt", -1)])
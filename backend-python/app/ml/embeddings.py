@@ -3,6 +3,10 @@ Sentence Embeddings Service using Sentence-Transformers
 For semantic search and similarity matching
 """
 
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import torch
 import numpy as np
 from sentence_transformers import SentenceTransformer
@@ -22,11 +26,16 @@ class EmbeddingService:
         self.model_name = model_name or settings.EMBEDDINGS_MODEL
         self.model: Optional[SentenceTransformer] = None
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-    
+        # Single worker: torch already parallelizes inside encode(), so
+        # concurrent encode calls would just fight over the same cores
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embeddings")
+
     async def load_model(self):
         """Load the sentence transformer model"""
         try:
             logger.info(f"Loading embedding model: {self.model_name}")
+            if self.device == "cpu":
+                torch.set_num_threads(os.cpu_count() or 1)
             self.model = SentenceTransformer(self.model_name, device=self.device)
             logger.info(f"✅ Embedding model loaded on {self.device}")
         except Exception as e:
@@ -51,9 +60,10 @@ class EmbeddingService:
             texts,
             batch_size=batch_size,
             show_progress_bar=False,
-            convert_to_numpy=True
+            convert_to_numpy=True,
+            normalize_embeddings=True
         )
-        
+
         return embeddings
     
     def encode_single(self, text: str) -> List[float]:
@@ -72,11 +82,65 @@ class EmbeddingService:
         embedding = self.model.encode(
             text,
             show_progress_bar=False,
-            convert_to_numpy=True
+            convert_to_numpy=True,
+            normalize_embeddings=True
         )
-        
+
         return embedding.tolist()
-    
+
+    def _ensure_model(self):
+        """Synchronously load the model on first use (for non-async callers)"""
+        if self.model is None:
+            logger.info(f"Loading embedding model: {self.model_name}")
+            if self.device == "cpu":
+                torch.set_num_threads(os.cpu_count() or 1)
+            self.model = SentenceTransformer(self.model_name, device=self.device)
+
+    def embed_text(self, text: str) -> List[float]:
+        """
+        Encode a single text, loading the model if needed
+
+        Args:
+            text: Text string to encode
+
+        Returns:
+            List of floats representing the embedding
+        """
+        self._ensure_model()
+        return self.encode_single(text)
+
+    def embed_batch(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Encode multiple texts, loading the model if needed
+
+        Args:
+            texts: List of text strings to encode
+            batch_size: Batch size for encoding
+
+        Returns:
+            Contiguous float32 ndarray of embeddings, one row per text
+            (consumers like Chroma can take it with a single buffer copy)
+        """
+        self._ensure_model()
+        return np.ascontiguousarray(self.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+    async def encode_async(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Encode texts in a background thread without blocking the event loop
+
+        Args:
+            texts: List of text strings to encode
+            batch_size: Batch size for encoding
+
+        Returns:
+            numpy array of embeddings
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            lambda: self.encode(texts, batch_size=batch_size)
+        )
+
     def compute_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
         """
         Compute cosine similarity between two embeddings
@@ -88,13 +152,17 @@ class EmbeddingService:
         Returns:
             Similarity score (0-1)
         """
-        emb1 = np.array(embedding1)
-        emb2 = np.array(embedding2)
-        
-        # Cosine similarity
-        similarity = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
-        
-        return float(similarity)
+        emb1 = np.asarray(embedding1)
+        emb2 = np.asarray(embedding2)
+
+        # Freshly encoded embeddings are unit-norm (normalize_embeddings=True),
+        # but vectors persisted before that change (e.g. knowledge_base
+        # documents written by the scraper) are not - divide by the norms so
+        # mixed inputs still score in [-1, 1]
+        denom = float(np.linalg.norm(emb1)) * float(np.linalg.norm(emb2))
+        if denom == 0.0:
+            return 0.0
+        return float(np.dot(emb1, emb2) / denom)
     
     def find_most_similar(
         self,
@@ -113,15 +181,25 @@ class EmbeddingService:
         Returns:
             List of (index, similarity_score) tuples
         """
-        similarities = []
-        for idx, candidate in enumerate(candidate_embeddings):
-            sim = self.compute_similarity(query_embedding, candidate)
-            similarities.append((idx, sim))
-        
-        # Sort by similarity (descending)
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        
-        return similarities[:top_k]
+        if not len(candidate_embeddings):
+            return []
+
+        # One normalization pass over the candidate matrix keeps scores
+        # comparable whether the stored vectors are unit-norm or not, and a
+        # single matrix-vector product replaces the per-candidate Python loop
+        candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(candidates, axis=1, keepdims=True)
+        norms[norms == 0.0] = 1.0
+        candidates = candidates / norms
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm > 0.0:
+            query = query / query_norm
+
+        similarities = candidates @ query
+        top_indices = np.argsort(similarities)[::-1][:top_k]
+        return [(int(idx), float(similarities[idx])) for idx in top_indices]
     
     async def semantic_search(
         self,
@@ -145,8 +223,8 @@ class EmbeddingService:
         if not documents:
             return []
         
-        # Encode query
-        query_embedding = self.encode_single(query)
+        # Encode query off the event loop so concurrent requests keep running
+        query_embedding = (await self.encode_async([query]))[0]
         
         # Extract embeddings from documents
         doc_embeddings = []
@@ -3,6 +3,10 @@ Hybrid AI Chatbot Service
 Combines ML-trained models with Google Gemini for intelligent responses
 """
 
+import asyncio
+import re
+import time
+
 import google.generativeai as genai
 from typing import List, Dict, Any, Optional
 from loguru import logger
@@ -15,6 +19,158 @@ from app.database import get_database, map_documents
 from app.ml.embeddings import EmbeddingService
 from app.ml.content_classifier import ContentClassifier
 
+# Intent keywords, matched in one compiled-alternation scan over the
+# message instead of a dozen any(substring) passes; a keyword may belong
+# to several intents
+_INTENT_KEYWORDS = {
+    'timetable': ['timetable', 'time table', 'schedule', 'class', 'lecture', 'timing', 'time-table', 'period', 'routine', 'classes when'],
+    'exam': ['exam', 'examination', 'test', 'midterm', 'final', 'assessment', 'evaluation', 'quiz', 'internal', 'semester exam'],
+    'holiday': ['holiday', 'vacation', 'break', 'leave', 'off', 'closed', 'reopen', 'working day'],
+    'document': ['document', 'file', 'pdf', 'syllabus', 'notes', 'material', 'resource', 'download', 'circular', 'form'],
+    'event': ['event', 'fest', 'competition', 'workshop', 'seminar', 'webinar', 'conference', 'symposium', 'hackathon', 'cultural'],
+    'placement': ['placement', 'placed', 'package', 'salary', 'company', 'ctc', 'job', 'recruit', 'hiring', 'offer', 'campus placement', 'interview', 'training'],
+    'announcement': ['announcement', 'notice', 'update', 'news', 'notification', 'circular', 'information', 'latest'],
+    'autonomous': ['syllabus', 'scheme', 'autonomous', 'curriculum', 'regulation', 'policy', 'assessment', 'marks', 'grading', 'evaluation'],
+    'academic_council': ['hod', 'head', 'dean', 'principal', 'chairperson', 'professor', 'academic council', 'faculty', 'member secretary', 'teacher', 'staff', 'coordinator'],
+    'general': ['college', 'bmsit', 'institute', 'about', 'location', 'contact', 'address', 'email', 'phone', 'campus'],
+    'admission': ['admission', 'admissions', 'apply', 'eligibility', 'fee', 'fees', 'seat', 'intake', 'kcet', 'comedk', 'enroll'],
+}
+
+_KEYWORD_INTENTS: Dict[str, set] = {}
+for _intent, _words in _INTENT_KEYWORDS.items():
+    for _word in _words:
+        _KEYWORD_INTENTS.setdefault(_word, set()).add(_intent)
+
+# Longest-first so multi-word keywords win over their embedded substrings
+_KEYWORD_RE = re.compile(
+    "|".join(map(re.escape, sorted(_KEYWORD_INTENTS, key=len, reverse=True)))
+)
+
+# Placement triggers that route a message to the RAG service
+_RAG_TRIGGER_RE = re.compile(
+    "|".join(map(re.escape, sorted(
+        ['placement', 'placed', 'package', 'salary', 'company', 'companies',
+         'ctc', 'offer', 'recruit', 'hiring', 'job', 'career', '2025'],
+        key=len, reverse=True)))
+)
+
+
+# System-prompt templates, parsed once at import; per request only the
+# dynamic fields are substituted instead of re-assembling the whole
+# multi-hundred-char literal
+_SYSTEM_PROMPT_TEMPLATE = """You are a helpful campus assistant for BMSIT (BMS Institute of Technology and Management) with ML-powered knowledge retrieval and web search capabilities.
+
+{role_context}
+{user_context}
+{time_context}
+{admin_instructions}
+
+IMPORTANT INSTRUCTIONS:
+1. Give CLEAR and HELPFUL answers (3-5 sentences when needed, brief for simple questions)
+2. {greeting}Use a friendly, conversational tone
+3. ALWAYS use information from the Knowledge Base AND Web Search Results below when available
+4. When PDF links or URLs are provided, ALWAYS INCLUDE them in your response
+5. When documents are listed with download links (/api/documents/ID/download), PROVIDE the full link to help students access them
+6. Be direct and informative
+7. Prioritize PLACEMENT DATA, ADMISSIONS INFO, TIMETABLE queries, and DOCUMENT requests
+8. If web search results are provided, integrate them naturally
+9. For "next class" questions, compare current time with timetable
+10. If you don't have enough information in the Knowledge Base, say so and suggest alternatives
+11. For queries about "fees", "contact", "faculty" - ALWAYS check Knowledge Base first
+12. When students ask for documents/notes/materials, list ALL relevant documents with their download links
+
+Your Knowledge Base (ML-Enhanced + Web Search):
+{knowledge}
+
+CRITICAL RULES:
+- If Knowledge Base contains the answer (fees, PDFs, contacts, etc.), USE IT
+- If Knowledge Base is EMPTY or INSUFFICIENT, say: "I don't have that specific information in my current knowledge base. However, you can check the official BMSIT website at https://bmsit.ac.in or contact the administration."
+- For ambiguous queries, ask clarifying questions
+- Always cite sources when available
+- If query is about multiple topics, address each one
+
+Answer the question based on the information above. Be helpful and accurate.
+"""
+
+_STREAM_SYSTEM_PROMPT_TEMPLATE = """You are CampusAura AI, an intelligent campus assistant for students, teachers, and administrators.
+
+{role_context}
+{user_context}
+
+Guidelines:
+1. Be helpful, accurate, and concise
+2. {greeting}Use a friendly, personalized tone
+3. ALWAYS use information from the Knowledge Base below when available
+4. When PDF links or URLs are provided, INCLUDE them in your response
+5. Be direct and to the point
+6. Prioritize PLACEMENT DATA and ADMISSIONS INFO when relevant
+
+Your Knowledge Base (ML-Enhanced):
+{knowledge}
+
+CRITICAL: If the Knowledge Base contains information about the question (like fee structures, PDF links, contact details, etc.), YOU MUST use it and provide those details/links in your answer.
+
+Answer the question based ONLY on the information provided above. If the information is not available in the Knowledge Base, politely say you don't have that information. Keep your response brief and focused.
+"""
+
+
+# One pooled HTTP session for web-search page fetches: keep-alive reuses
+# the TCP/TLS connection when several results come from the same host
+_HTTP_SESSION = requests.Session()
+_HTTP_SESSION.headers.update({'User-Agent': 'Mozilla/5.0'})
+
+# Static pieces of GenerativeModel construction, built once at import;
+# per request only the system instruction (which embeds the knowledge
+# context) actually changes
+_GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "max_output_tokens": 1024,
+}
+
+_SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
+]
+
+
+async def _skipped_fetch():
+    """Stand-in awaitable for sections ruled out by intent detection"""
+    return None
+
+
+def _detect_intents(query_lower: str) -> set:
+    """Every intent whose keywords occur in the query, from one scan"""
+    intents = set()
+    for match in _KEYWORD_RE.finditer(query_lower):
+        intents |= _KEYWORD_INTENTS[match.group(0)]
+    return intents
+
+
+# Campus-wide context (placements, events, announcements) changes at
+# minute scale, not per request - a short-TTL cache lets concurrent chats
+# share one fetch per collection instead of stampeding Mongo
+_CONTEXT_CACHE_TTL_SECONDS = 30
+_context_cache: Dict[str, tuple] = {}  # key -> (expires_at, value)
+_context_cache_lock = asyncio.Lock()
+
+
+async def _cached_fetch(key: str, fetch):
+    """Return the cached value for key, refreshing via fetch() on expiry"""
+    entry = _context_cache.get(key)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+
+    async with _context_cache_lock:
+        entry = _context_cache.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        value = await fetch()
+        _context_cache[key] = (time.monotonic() + _CONTEXT_CACHE_TTL_SECONDS, value)
+        return value
+
+
 # Lazy import RAG service to avoid import issues
 rag_service = None
 try:
@@ -70,7 +226,7 @@ class HybridChatbot:
             for idx, url in enumerate(search_results, 1):
                 try:
                     # Fetch and parse the page
-                    response = requests.get(url, timeout=5, headers={'User-Agent': 'Mozilla/5.0'})
+                    response = _HTTP_SESSION.get(url, timeout=5)
                     soup = BeautifulSoup(response.content, 'html.parser')
                     
                     # Extract text from paragraphs
@@ -123,18 +279,20 @@ class HybridChatbot:
         knowledge_parts = []
         query_lower = query.lower()
         
-        # Detect query intent based on EXPANDED keywords for better coverage
-        is_timetable_query = any(word in query_lower for word in ['timetable', 'time table', 'schedule', 'class', 'lecture', 'timing', 'time-table', 'period', 'routine', 'classes when'])
-        is_exam_query = any(word in query_lower for word in ['exam', 'examination', 'test', 'midterm', 'final', 'assessment', 'evaluation', 'quiz', 'internal', 'semester exam'])
-        is_holiday_query = any(word in query_lower for word in ['holiday', 'vacation', 'break', 'leave', 'off', 'closed', 'reopen', 'working day'])
-        is_document_query = any(word in query_lower for word in ['document', 'file', 'pdf', 'syllabus', 'notes', 'material', 'resource', 'download', 'circular', 'form'])
-        is_event_query = any(word in query_lower for word in ['event', 'fest', 'competition', 'workshop', 'seminar', 'webinar', 'conference', 'symposium', 'hackathon', 'cultural'])
-        is_placement_query = any(word in query_lower for word in ['placement', 'placed', 'package', 'salary', 'company', 'ctc', 'job', 'recruit', 'hiring', 'offer', 'campus placement', 'interview', 'training'])
-        is_announcement_query = any(word in query_lower for word in ['announcement', 'notice', 'update', 'news', 'notification', 'circular', 'information', 'latest'])
-        is_autonomous_query = any(word in query_lower for word in ['syllabus', 'scheme', 'autonomous', 'curriculum', 'regulation', 'policy', 'assessment', 'marks', 'grading', 'evaluation'])
-        is_academic_council_query = any(word in query_lower for word in ['hod', 'head', 'dean', 'principal', 'chairperson', 'professor', 'academic council', 'faculty', 'member secretary', 'teacher', 'staff', 'coordinator'])
-        is_general_query = any(word in query_lower for word in ['college', 'bmsit', 'institute', 'about', 'location', 'contact', 'address', 'email', 'phone', 'campus'])
-        is_admission_query = any(word in query_lower for word in ['admission', 'admissions', 'apply', 'eligibility', 'fee', 'fees', 'seat', 'intake', 'kcet', 'comedk', 'enroll'])
+        # Detect query intent - one linear scan over the message covers all
+        # keyword groups at once
+        intents = _detect_intents(query_lower)
+        is_timetable_query = 'timetable' in intents
+        is_exam_query = 'exam' in intents
+        is_holiday_query = 'holiday' in intents
+        is_document_query = 'document' in intents
+        is_event_query = 'event' in intents
+        is_placement_query = 'placement' in intents
+        is_announcement_query = 'announcement' in intents
+        is_autonomous_query = 'autonomous' in intents
+        is_academic_council_query = 'academic_council' in intents
+        is_general_query = 'general' in intents
+        is_admission_query = 'admission' in intents
         
         # 1. TIMETABLES - Check if query is about schedules
         if is_timetable_query:
@@ -531,7 +689,7 @@ class HybridChatbot:
                             knowledge_parts.append(f"   📥 Access: /api/documents/{doc_id}/download")
                             knowledge_parts.append("")
                         
-                        logger.info(f"Found {len(relevant_docs)} relevant documents for query")
+                        logger.debug(f"Found {len(relevant_docs)} relevant documents for query")
                     else:
                         knowledge_parts.append("\n📄 No documents found matching your query.\n")
                 else:
@@ -539,44 +697,67 @@ class HybridChatbot:
             except Exception as e:
                 logger.warning(f"Error fetching documents: {e}")
         
+        # 6-8. PLACEMENTS / EVENTS / ANNOUNCEMENTS - these fetches are
+        # independent of each other, so issue the active ones together and
+        # overlap their Mongo round-trips instead of paying one RTT after
+        # another
+        want_placements = is_placement_query or not any([is_timetable_query, is_exam_query, is_holiday_query, is_document_query])
+        want_events = is_event_query or not any([is_timetable_query, is_exam_query, is_holiday_query])
+        want_announcements = is_announcement_query or not any([is_timetable_query, is_exam_query, is_holiday_query, is_document_query])
+
+        announcements_filter = {}
+        if category:
+            announcements_filter['category'] = category
+
+        # Project to the fields the rendering below actually reads and hint
+        # the (date, -1) index so the server skips plan selection; wire bytes
+        # and BSON decode then scale with the rendered text, not full docs
+        placements, events, announcements = await asyncio.gather(
+            _cached_fetch(
+                'placements',
+                lambda: db.placements.find({}, {'title': 1, 'content': 1})
+                .sort('date', -1).hint([('date', -1)]).limit(10).to_list(length=10)
+            ) if want_placements else _skipped_fetch(),
+            _cached_fetch(
+                'events',
+                lambda: db.events.find({}, {'title': 1, 'content': 1})
+                .sort('date', -1).hint([('date', -1)]).limit(5).to_list(length=5)
+            ) if want_events else _skipped_fetch(),
+            _cached_fetch(
+                f"announcements:{category or ''}",
+                lambda: db.announcements.find(announcements_filter, {'title': 1, 'content': 1, 'category': 1})
+                .sort('date', -1).hint([('date', -1)]).limit(15).to_list(length=15)
+            ) if want_announcements else _skipped_fetch(),
+        )
+
         # 6. PLACEMENTS (High Priority)
-        if is_placement_query or not any([is_timetable_query, is_exam_query, is_holiday_query, is_document_query]):
-            placements = await db.placements.find({}).sort('date', -1).limit(10).to_list(length=10)
-            if placements:
-                placements = map_documents(placements)
-                knowledge_parts.append("💼 Placement Information:\n")
-                for idx, placement in enumerate(placements, 1):
-                    knowledge_parts.append(f"{idx}. {placement.get('title', '')}")
-                    knowledge_parts.append(f"   {placement.get('content', '')}")
-                knowledge_parts.append("")
+        if placements:
+            placements = map_documents(placements)
+            knowledge_parts.append("💼 Placement Information:\n")
+            for idx, placement in enumerate(placements, 1):
+                knowledge_parts.append(f"{idx}. {placement.get('title', '')}")
+                knowledge_parts.append(f"   {placement.get('content', '')}")
+            knowledge_parts.append("")
         
         # 7. EVENTS
-        if is_event_query or not any([is_timetable_query, is_exam_query, is_holiday_query]):
-            events = await db.events.find({}).sort('date', -1).limit(5).to_list(length=5)
-            if events:
-                events = map_documents(events)
-                knowledge_parts.append("📅 Upcoming Events:\n")
-                for idx, event in enumerate(events, 1):
-                    knowledge_parts.append(f"{idx}. {event.get('title', '')}")
-                    knowledge_parts.append(f"   {event.get('content', '')}")
-                knowledge_parts.append("")
+        if events:
+            events = map_documents(events)
+            knowledge_parts.append("📅 Upcoming Events:\n")
+            for idx, event in enumerate(events, 1):
+                knowledge_parts.append(f"{idx}. {event.get('title', '')}")
+                knowledge_parts.append(f"   {event.get('content', '')}")
+            knowledge_parts.append("")
         
         # 8. ANNOUNCEMENTS
-        if is_announcement_query or not any([is_timetable_query, is_exam_query, is_holiday_query, is_document_query]):
-            announcements_filter = {}
-            if category:
-                announcements_filter['category'] = category
-            
-            announcements = await db.announcements.find(announcements_filter).sort('date', -1).limit(15).to_list(length=15)
-            if announcements:
-                announcements = map_documents(announcements)
-                knowledge_parts.append("📢 Campus Announcements:\n")
-                for idx, ann in enumerate(announcements[:8], 1):
-                    knowledge_parts.append(f"{idx}. {ann.get('title', '')}")
-                    knowledge_parts.append(f"   {ann.get('content', '')}")
-                    if ann.get('category'):
-                        knowledge_parts.append(f"   Category: {ann['category']}")
-                knowledge_parts.append("")
+        if announcements:
+            announcements = map_documents(announcements)
+            knowledge_parts.append("📢 Campus Announcements:\n")
+            for idx, ann in enumerate(announcements[:8], 1):
+                knowledge_parts.append(f"{idx}. {ann.get('title', '')}")
+                knowledge_parts.append(f"   {ann.get('content', '')}")
+                if ann.get('category'):
+                    knowledge_parts.append(f"   Category: {ann['category']}")
+            knowledge_parts.append("")
         
         # 9. KNOWLEDGE BASE - Search both collections with keyword intelligence
         try:
@@ -718,16 +899,13 @@ class HybridChatbot:
         """
         try:
             # Check if this is a placement-related query - use RAG if so
-            placement_keywords = ['placement', 'placed', 'package', 'salary', 'company', 'companies', 
-                                 'ctc', 'offer', 'recruit', 'hiring', 'job', 'career', '2025']
-            
-            is_placement_query = any(keyword in message.lower() for keyword in placement_keywords)
+            is_placement_query = _RAG_TRIGGER_RE.search(message.lower()) is not None
             
             if is_placement_query and rag_service:
-                logger.info("Detected placement query - using RAG service")
+                logger.debug("Detected placement query - using RAG service")
                 try:
-                    # Use RAG service for placement queries
-                    rag_result = rag_service.query(message, n_results=5)
+                    # Use RAG service for placement queries (off the event loop)
+                    rag_result = await rag_service.aquery(message, n_results=5)
                     
                     if rag_result['confidence'] != 'low':
                         return {
@@ -978,84 +1156,50 @@ Examples of admin queries you can answer:
 - "What is [USN]'s timetable?"
 """
             
-            system_prompt = f"""You are a helpful campus assistant for BMSIT (BMS Institute of Technology and Management) with ML-powered knowledge retrieval and web search capabilities.
-
-{role_context}
-{user_context}
-{time_context}
-{admin_instructions}
-
-IMPORTANT INSTRUCTIONS:
-1. Give CLEAR and HELPFUL answers (3-5 sentences when needed, brief for simple questions)
-2. {greeting}Use a friendly, conversational tone
-3. ALWAYS use information from the Knowledge Base AND Web Search Results below when available
-4. When PDF links or URLs are provided, ALWAYS INCLUDE them in your response
-5. When documents are listed with download links (/api/documents/ID/download), PROVIDE the full link to help students access them
-6. Be direct and informative
-7. Prioritize PLACEMENT DATA, ADMISSIONS INFO, TIMETABLE queries, and DOCUMENT requests
-8. If web search results are provided, integrate them naturally
-9. For "next class" questions, compare current time with timetable
-10. If you don't have enough information in the Knowledge Base, say so and suggest alternatives
-11. For queries about "fees", "contact", "faculty" - ALWAYS check Knowledge Base first
-12. When students ask for documents/notes/materials, list ALL relevant documents with their download links
-
-Your Knowledge Base (ML-Enhanced + Web Search):
-{knowledge}
-
-CRITICAL RULES:
-- If Knowledge Base contains the answer (fees, PDFs, contacts, etc.), USE IT
-- If Knowledge Base is EMPTY or INSUFFICIENT, say: "I don't have that specific information in my current knowledge base. However, you can check the official BMSIT website at https://bmsit.ac.in or contact the administration."
-- For ambiguous queries, ask clarifying questions
-- Always cite sources when available
-- If query is about multiple topics, address each one
-
-Answer the question based on the information above. Be helpful and accurate.
-"""
+            system_prompt = _SYSTEM_PROMPT_TEMPLATE.format(
+                role_context=role_context,
+                user_context=user_context,
+                time_context=time_context,
+                admin_instructions=admin_instructions,
+                greeting=greeting,
+                knowledge=knowledge,
+            )
             
-            # Try Gemini models with fallback
+            # Try Gemini models with fallback. GenerativeModel() is a local
+            # object - it never talks to the API - so it sits outside the
+            # try/except; only generate_content can actually fail and move
+            # the loop to the next model
             last_error = None
             for model_name in self.models:
+                model = genai.GenerativeModel(
+                    model_name=model_name,
+                    generation_config=_GENERATION_CONFIG,
+                    system_instruction=system_prompt,
+                    safety_settings=_SAFETY_SETTINGS
+                )
                 try:
-                    logger.info(f"Using Gemini model: {model_name}")
-                    
-                    model = genai.GenerativeModel(
-                        model_name=model_name,
-                        generation_config={
-                            "temperature": 0.7,
-                            "max_output_tokens": 1024,
-                        },
-                        system_instruction=system_prompt,
-                        safety_settings=[
-                            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
-                        ]
-                    )
+                    logger.debug(f"Using Gemini model: {model_name}")
                     
                     response = model.generate_content(message)
-                    
-                    # Check if response was blocked
-                    if not response.candidates:
-                        logger.warning(f"No candidates returned by {model_name}")
-                        raise ValueError("No response candidates")
-                    
-                    candidate = response.candidates[0]
-                    
-                    # Check finish_reason
-                    if hasattr(candidate, 'finish_reason') and candidate.finish_reason != 1:  # 1 = STOP (normal completion)
-                        finish_reason_name = str(candidate.finish_reason)
-                        logger.warning(f"Response blocked by {model_name} - finish_reason: {finish_reason_name}")
-                        raise ValueError(f"Response blocked: {finish_reason_name}")
-                    
-                    # Check if content exists
-                    if not candidate.content or not candidate.content.parts:
-                        logger.warning(f"No content parts in response from {model_name}")
+
+                    # response.text itself raises when the answer was blocked
+                    # or came back without content parts - one try/except
+                    # replaces the old candidate/finish_reason/parts check
+                    # chain
+                    try:
+                        response_text = response.text
+                    except (AttributeError, ValueError) as extract_error:
+                        finish_reason = None
+                        if response.candidates:
+                            finish_reason = getattr(response.candidates[0], 'finish_reason', None)
+                        logger.warning(f"Blocked or empty response from {model_name} - finish_reason: {finish_reason}")
+                        raise ValueError(f"Response blocked or empty: {extract_error}")
+
+                    if not response_text:
+                        logger.warning(f"No content in response from {model_name}")
                         raise ValueError("No content in response")
                     
-                    response_text = response.text
-                    
-                    logger.info(f"✅ Response generated with {model_name}")
+                    logger.debug(f"✅ Response generated with {model_name}")
                     
                     # Prepare metadata
                     metadata = {
@@ -1154,13 +1298,46 @@ Answer the question based on the information above. Be helpful and accurate.
             Dict chunks with content, done flag, and metadata
         """
         try:
+            # Placement queries stream through the RAG service, mirroring the
+            # buffered path in generate_response. A low-confidence retrieval
+            # arrives as a single done-chunk before any text has been sent,
+            # so it can still fall through to the hybrid stream below
+            if _RAG_TRIGGER_RE.search(message.lower()) and rag_service:
+                logger.debug("Detected placement query - streaming via RAG service")
+                try:
+                    # query_stream blocks on network I/O; advance it chunk by
+                    # chunk in a worker thread to keep the event loop free
+                    loop = asyncio.get_running_loop()
+                    rag_stream = rag_service.query_stream(message, n_results=5)
+                    chunk = await loop.run_in_executor(None, next, rag_stream, None)
+                    if chunk is not None and not (chunk.get('done') and chunk.get('confidence') == 'low'):
+                        while chunk is not None:
+                            out = {
+                                "content": chunk['content'],
+                                "done": chunk['done'],
+                                "cached": chunk.get('cached', False)
+                            }
+                            if chunk['done']:
+                                out["metadata"] = {
+                                    "model": "RAG with Gemini 2.5 Flash",
+                                    "ml_enabled": True,
+                                    "rag_used": True,
+                                    "confidence": chunk.get('confidence'),
+                                    "streaming": True
+                                }
+                            yield out
+                            chunk = await loop.run_in_executor(None, next, rag_stream, None)
+                        return
+                except Exception as rag_error:
+                    logger.warning(f"RAG streaming failed, falling back to hybrid: {rag_error}")
+
             # Build knowledge context
             knowledge = await self.build_knowledge_context(
                 query=message,
                 category=category,
                 use_ml_search=True
             )
-            
+
             # Create system prompt
             greeting = f"Hello {user_name}! " if user_name and user_name != "Guest" else ""
             role_context = f"You are helping {user_name}, a {user_role} at the institution." if user_name and user_name != "Guest" else f"User Role: {user_role or 'Guest'}"
@@ -1179,47 +1356,24 @@ Answer the question based on the information above. Be helpful and accurate.
                 if semester:
                     user_context += f"\n📚 Current Semester: {semester}"
             
-            system_prompt = f"""You are CampusAura AI, an intelligent campus assistant for students, teachers, and administrators.
-
-{role_context}
-{user_context}
-
-Guidelines:
-1. Be helpful, accurate, and concise
-2. {greeting}Use a friendly, personalized tone
-3. ALWAYS use information from the Knowledge Base below when available
-4. When PDF links or URLs are provided, INCLUDE them in your response
-5. Be direct and to the point
-6. Prioritize PLACEMENT DATA and ADMISSIONS INFO when relevant
-
-Your Knowledge Base (ML-Enhanced):
-{knowledge}
-
-CRITICAL: If the Knowledge Base contains information about the question (like fee structures, PDF links, contact details, etc.), YOU MUST use it and provide those details/links in your answer.
-
-Answer the question based ONLY on the information provided above. If the information is not available in the Knowledge Base, politely say you don't have that information. Keep your response brief and focused.
-"""
+            system_prompt = _STREAM_SYSTEM_PROMPT_TEMPLATE.format(
+                role_context=role_context,
+                user_context=user_context,
+                greeting=greeting,
+                knowledge=knowledge,
+            )
             
             # Try Gemini models with streaming
             last_error = None
             for model_name in self.models:
+                model = genai.GenerativeModel(
+                    model_name=model_name,
+                    generation_config=_GENERATION_CONFIG,
+                    system_instruction=system_prompt,
+                    safety_settings=_SAFETY_SETTINGS
+                )
                 try:
-                    logger.info(f"Using Gemini model with streaming: {model_name}")
-                    
-                    model = genai.GenerativeModel(
-                        model_name=model_name,
-                        generation_config={
-                            "temperature": 0.7,
-                            "max_output_tokens": 1024,
-                        },
-                        system_instruction=system_prompt,
-                        safety_settings=[
-                            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
-                        ]
-                    )
+                    logger.debug(f"Using Gemini model with streaming: {model_name}")
                     
                     # Generate content with streaming
                     response = model.generate_content(message, stream=True)
@@ -1248,7 +1402,7 @@ Answer the question based ONLY on the information provided above. If the informa
                         }
                     }
                     
-                    logger.info(f"✅ Streaming response completed with {model_name}")
+                    logger.debug(f"✅ Streaming response completed with {model_name}")
                     return
                 
                 except Exception as model_error:
@@ -0,0 +1,109 @@
+"""
+Chat route using the hybrid chatbot
+Buffered JSON response by default, SSE streaming on request
+"""
+
+import json
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from loguru import logger
+
+router = APIRouter()
+
+# Largest chat body accepted; anything bigger is rejected before parsing
+_MAX_CHAT_BODY_BYTES = 64 * 1024
+
+
+@router.post("/chat")
+async def simple_chat(request: Request):
+    """Chat endpoint using Hybrid Chatbot with ML and knowledge base"""
+    try:
+        # Cheap header checks first: empty and oversize requests are turned
+        # away before a single body byte is read or parsed
+        content_length = request.headers.get("content-length")
+        if not content_length or content_length == "0":
+            return JSONResponse(
+                status_code=400,
+                content={"error": "Message is required"}
+            )
+        try:
+            content_length = int(content_length)
+        except ValueError:
+            return JSONResponse(
+                status_code=400,
+                content={"error": "Invalid Content-Length header"}
+            )
+        if content_length > _MAX_CHAT_BODY_BYTES:
+            return JSONResponse(
+                status_code=413,
+                content={"error": "Request body too large"}
+            )
+
+        # Get message and context from request (json.loads on the raw bytes
+        # skips Starlette's extra wrapping around the same call)
+        try:
+            body = json.loads(await request.body())
+        except ValueError:
+            return JSONResponse(
+                status_code=400,
+                content={"error": "Invalid JSON body"}
+            )
+        user_message = body.get("message", "")
+        context = body.get("context", {})
+        
+        # Extract user information
+        user_role = context.get("role", "Guest")
+        user_name = context.get("name", "Guest")
+        user_data = context.get("data", {})  # Get the full user data including CGPA, attendance, etc.
+        
+        if not user_message:
+            return JSONResponse(
+                status_code=400,
+                content={"error": "Message is required"}
+            )
+        
+        # Reuse the worker-wide chatbot built at startup
+        chatbot = request.app.state.chatbot
+        
+        # Streaming path: send tokens as they arrive instead of buffering
+        # the whole generation, so first output reaches the client at
+        # first-chunk latency. Opt-in (?stream=true or "stream": true in the
+        # body) - the aggregated JSON shape stays the default for existing
+        # clients
+        if body.get("stream") or request.query_params.get("stream") == "true":
+            async def event_stream():
+                async for chunk in chatbot.generate_response_stream(
+                    message=user_message,
+                    category=None,
+                    user_role=user_role,
+                    user_name=user_name,
+                    user_data=user_data
+                ):
+                    yield f"data: {json.dumps(chunk)}\n\n"
+
+            return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+        # Generate personalized response with full user context
+        result = await chatbot.generate_response(
+            message=user_message,
+            category=None,
+            user_role=user_role,
+            user_name=user_name,
+            user_data=user_data  # Pass the full user data
+        )
+        
+        logger.debug(f"✓ Generated response using {result['metadata'].get('model', 'unknown')}")
+        
+        return JSONResponse(content=result)
+        
+    except Exception as e:
+        logger.error(f"Chat error: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={
+                "error": "Chat service error",
+                "message": str(e),
+                "fallback_response": "I'm having trouble processing your request. Please try again or contact support."
+            }
+        )
@@ -570,7 +570,7 @@ async def scrape_entire_website(
                     'categories': classification['categories'],
                     'contentType': classification['type'],
                     'importance': classification['importance'],
-                    'tags': list(set(classification['categories'] + [classification['type'], classification['primary']])),
+                    'tags': list({*classification['categories'], classification['type'], classification['primary']}),
                     'confidence': classification['confidence'],
                     'classificationScore': classification.get('totalScore', 0),
                     # Content fields
@@ -42,27 +42,32 @@ class TimetableConfirm(BaseModel):
     days: Dict[str, List[TimeSlot]]
     fileUrl: str
 
-def extract_text_from_image(image_path: str) -> str:
-    """Extract text from image using Tesseract OCR"""
+def extract_text_from_image(image_source) -> str:
+    """Extract text from an image path or in-memory file using Tesseract OCR"""
     try:
-        img = Image.open(image_path)
-        text = pytesseract.image_to_string(img)
+        img = Image.open(image_source)
+        # --psm 6 treats the page as one uniform text block - right for a
+        # timetable grid, and skips Tesseract's page-segmentation analysis
+        text = pytesseract.image_to_string(img, config='--psm 6')
         return text
     except Exception as e:
         raise Exception(f"OCR extraction failed: {str(e)}")
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract text from PDF"""
+def extract_text_from_pdf(pdf_source) -> str:
+    """Extract text from a PDF path or in-memory file"""
     try:
-        text = ""
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-        return text
+        if isinstance(pdf_source, str):
+            with open(pdf_source, 'rb') as file:
+                return _read_pdf_text(file)
+        return _read_pdf_text(pdf_source)
     except Exception as e:
         raise Exception(f"PDF extraction failed: {str(e)}")
 
+def _read_pdf_text(file) -> str:
+    """Concatenate the text of every page in an open PDF file object"""
+    pdf_reader = PyPDF2.PdfReader(file)
+    return "".join(page.extract_text() for page in pdf_reader.pages)
+
 def parse_timetable_text(text: str) -> Dict[str, List[Dict[str, str]]]:
     """Parse extracted text to structure timetable data"""
     days = {
@@ -199,12 +204,13 @@ async def analyze_timetable(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
     
-    # Extract text based on file type
+    # Extract text from the upload bytes already in memory - re-reading
+    # the file just written to disk would decode the image a second time
     try:
         if file_ext.lower() == 'pdf':
-            extracted_text = extract_text_from_pdf(file_path)
+            extracted_text = extract_text_from_pdf(io.BytesIO(content))
         else:
-            extracted_text = extract_text_from_image(file_path)
+            extracted_text = extract_text_from_image(io.BytesIO(content))
         
         # Parse the extracted text
         parsed_schedule = parse_timetable_text(extracted_text)
@@ -165,7 +165,7 @@ def extract_placement_data(text: str) -> Dict:
     
     # Filter out common non-company words
     excluded_words = ['total', 'students', 'placed', 'package', 'offers', 'received', 'year', 'average', 'highest']
-    placement_info['companies'] = list(set([c for c in all_companies if len(c) > 2 and not c.isdigit() and c.lower() not in excluded_words]))
+    placement_info['companies'] = list({c for c in all_companies if len(c) > 2 and not c.isdigit() and c.lower() not in excluded_words})
     
     # Extract student counts - match multiple patterns
     students = re.findall(PLACEMENT_PATTERNS['students'], text, re.IGNORECASE)
@@ -185,7 +185,7 @@ def extract_placement_data(text: str) -> Dict:
     
     # Extract years
     years = re.findall(PLACEMENT_PATTERNS['year'], text, re.IGNORECASE)
-    placement_info['years'] = sorted(list(set([y for y in years if y])), reverse=True)
+    placement_info['years'] = sorted({y for y in years if y}, reverse=True)
     
     # Calculate comprehensive statistics
     if placement_info['student_counts']:
@@ -8,13 +8,24 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-from jinja2 import Template
+from html import escape
+from jinja2 import Environment, select_autoescape
 from app.config import settings
 import logging
 import os
 
 logger = logging.getLogger(__name__)
 
+# Shared Jinja environment with autoescape so user-supplied fields
+# (user_name, role, etc.) are HTML-escaped automatically on render
+_template_env = Environment(autoescape=select_autoescape(["html", "xml"]))
+
+# Sentinels rendered into cached template skeletons, swapped for the real
+# per-recipient values at send time (see send_otp_email/send_welcome_email)
+_NAME_SENTINEL = "\x00NAME\x00"
+_EMAIL_SENTINEL = "\x00EMAIL\x00"
+_CODE_SENTINEL = "\x00CODE\x00"
+
 
 class EmailService:
     """
@@ -29,6 +40,11 @@ class EmailService:
         self.smtp_password = settings.SMTP_PASSWORD
         self.from_email = settings.FROM_EMAIL
         self.from_name = settings.FROM_NAME
+
+        # Rendered HTML skeletons keyed by role - only the recipient-specific
+        # fields change per email, so the full Jinja render happens once
+        self._otp_html_cache: dict = {}
+        self._welcome_html_cache: dict = {}
         
     async def send_email(
         self, 
@@ -54,28 +70,33 @@ class EmailService:
             bool: True if email sent successfully, False otherwise
         """
         try:
-            # Create message
-            message = MIMEMultipart("mixed")
+            # Build the body - pre-encode as UTF-8 so it isn't re-encoded per send
+            html_part = MIMEText(html_content, "html", "utf-8")
+
+            if text_content:
+                # Both parts exist - need an alternative wrapper
+                body = MIMEMultipart("alternative")
+                body.attach(MIMEText(text_content, "plain", "utf-8"))
+                body.attach(html_part)
+            else:
+                # HTML only - skip the multipart wrapper entirely
+                body = html_part
+
+            has_attachment = attachment_path and os.path.exists(attachment_path)
+
+            if has_attachment:
+                # Attachments require a mixed container around the body
+                message = MIMEMultipart("mixed")
+                message.attach(body)
+            else:
+                message = body
+
             message["From"] = f"{self.from_name} <{self.from_email}>"
             message["To"] = to_email
             message["Subject"] = subject
-            
-            # Create alternative part for text/html
-            msg_alternative = MIMEMultipart("alternative")
-            
-            # Add plain text version
-            if text_content:
-                text_part = MIMEText(text_content, "plain")
-                msg_alternative.attach(text_part)
-            
-            # Add HTML version
-            html_part = MIMEText(html_content, "html")
-            msg_alternative.attach(html_part)
-            
-            message.attach(msg_alternative)
-            
+
             # Add attachment if provided
-            if attachment_path and os.path.exists(attachment_path):
+            if has_attachment:
                 try:
                     with open(attachment_path, "rb") as attachment:
                         part = MIMEBase("application", "octet-stream")
@@ -210,14 +231,20 @@ class EmailService:
         CampusAura - Campus Management System
         """
         
-        template = Template(html_template)
-        html_content = template.render(
-            user_name=user_name, 
-            otp_code=otp_code,
-            role_display=role_display,
-            account_type=account_type
-        )
-        
+        skeleton = self._otp_html_cache.get(role.lower())
+        if skeleton is None:
+            template = _template_env.from_string(html_template)
+            skeleton = template.render(
+                user_name=_NAME_SENTINEL,
+                otp_code=_CODE_SENTINEL,
+                role_display=role_display,
+                account_type=account_type
+            )
+            self._otp_html_cache[role.lower()] = skeleton
+
+        # OTP codes are digits, so only the name needs escaping
+        html_content = skeleton.replace(_NAME_SENTINEL, escape(user_name)).replace(_CODE_SENTINEL, otp_code)
+
         return await self.send_email(to_email, subject, html_content, text_content)
     
     async def send_password_reset_email(
@@ -304,7 +331,7 @@ class EmailService:
         CampusAura - Campus Management System
         """
         
-        template = Template(html_template)
+        template = _template_env.from_string(html_template)
         html_content = template.render(user_name=user_name, reset_code=reset_code)
         
         return await self.send_email(to_email, subject, html_content, text_content)
@@ -380,13 +407,18 @@ class EmailService:
         CampusAura - Campus Management System
         """
         
-        template = Template(html_template)
-        html_content = template.render(
-            user_name=user_name, 
-            to_email=to_email, 
-            role=role
-        )
-        
+        skeleton = self._welcome_html_cache.get(role)
+        if skeleton is None:
+            template = _template_env.from_string(html_template)
+            skeleton = template.render(
+                user_name=_NAME_SENTINEL,
+                to_email=_EMAIL_SENTINEL,
+                role=role
+            )
+            self._welcome_html_cache[role] = skeleton
+
+        html_content = skeleton.replace(_NAME_SENTINEL, escape(user_name)).replace(_EMAIL_SENTINEL, escape(to_email))
+
         return await self.send_email(to_email, subject, html_content, text_content)
     
     async def send_announcement_notification(
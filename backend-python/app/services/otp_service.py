@@ -3,10 +3,13 @@ OTP Service
 Generates, stores, and verifies One-Time Passwords
 """
 
+import hashlib
+import hmac
 import secrets
 import string
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
+from app.config import settings
 from app.database import get_database
 import logging
 
@@ -24,6 +27,16 @@ class OTPService:
     RESET_CODE_LENGTH = 6
     RESET_CODE_EXPIRY_MINUTES = 15  # Reset code valid for 15 minutes
     
+    @staticmethod
+    def _hash_code(code: str) -> str:
+        """
+        HMAC a code for storage - the database never sees plaintext codes,
+        and verification becomes a single indexed equality match
+        """
+        key = (settings.OTP_HMAC_KEY or settings.JWT_SECRET).encode()
+        return hmac.new(key, code.encode(), hashlib.sha256).hexdigest()
+    
+    
     @staticmethod
     def generate_otp() -> str:
         """
@@ -59,7 +72,8 @@ class OTPService:
         """
         db = get_database()
         otp_code = OTPService.generate_otp()
-        expires_at = datetime.utcnow() + timedelta(minutes=OTPService.OTP_EXPIRY_MINUTES)
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(minutes=OTPService.OTP_EXPIRY_MINUTES)
         
         # Remove any existing OTPs for this user and purpose
         await db.otps.delete_many({"user_id": user_id, "purpose": purpose})
@@ -68,9 +82,9 @@ class OTPService:
         otp_doc = {
             "user_id": user_id,
             "email": email,
-            "otp_code": otp_code,
+            "otp_hash": OTPService._hash_code(otp_code),
             "purpose": purpose,
-            "created_at": datetime.utcnow(),
+            "created_at": now,
             "expires_at": expires_at,
             "is_used": False,
             "attempts": 0
@@ -102,46 +116,31 @@ class OTPService:
         """
         db = get_database()
         
-        # Find OTP
-        otp_doc = await db.otps.find_one({
-            "user_id": user_id,
-            "purpose": purpose,
-            "is_used": False
-        })
-        
-        if not otp_doc:
-            logger.warning(f"No active OTP found for user {user_id}")
-            return False
-        
-        # Check expiration
-        if datetime.utcnow() > otp_doc["expires_at"]:
-            logger.warning(f"Expired OTP for user {user_id}")
-            await db.otps.delete_one({"_id": otp_doc["_id"]})
-            return False
-        
-        # Check attempts
-        if otp_doc["attempts"] >= max_attempts:
-            logger.warning(f"Too many attempts for user {user_id}")
-            await db.otps.delete_one({"_id": otp_doc["_id"]})
-            return False
-        
-        # Verify code
-        if otp_doc["otp_code"] == otp_code:
-            # Mark as used
-            await db.otps.update_one(
-                {"_id": otp_doc["_id"]},
-                {"$set": {"is_used": True}}
-            )
+        # Match by hash in a single atomic indexed query - only a live,
+        # unused OTP with attempts remaining can be consumed
+        otp_doc = await db.otps.find_one_and_update(
+            {
+                "user_id": user_id,
+                "purpose": purpose,
+                "otp_hash": OTPService._hash_code(otp_code),
+                "is_used": False,
+                "expires_at": {"$gt": datetime.now(timezone.utc)},
+                "attempts": {"$lt": max_attempts}
+            },
+            {"$set": {"is_used": True}}
+        )
+        
+        if otp_doc:
             logger.info(f"OTP verified successfully for user {user_id}")
             return True
-        else:
-            # Increment attempts
-            await db.otps.update_one(
-                {"_id": otp_doc["_id"]},
-                {"$inc": {"attempts": 1}}
-            )
-            logger.warning(f"Invalid OTP attempt for user {user_id}")
-            return False
+        
+        # Wrong/expired code - count the attempt against any active OTP
+        await db.otps.update_one(
+            {"user_id": user_id, "purpose": purpose, "is_used": False},
+            {"$inc": {"attempts": 1}}
+        )
+        logger.warning(f"Invalid OTP attempt for user {user_id}")
+        return False
     
     @staticmethod
     async def create_reset_code(email: str) -> Optional[str]:
@@ -163,7 +162,8 @@ class OTPService:
             return None
         
         reset_code = OTPService.generate_reset_code()
-        expires_at = datetime.utcnow() + timedelta(minutes=OTPService.RESET_CODE_EXPIRY_MINUTES)
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(minutes=OTPService.RESET_CODE_EXPIRY_MINUTES)
         
         # Remove any existing reset codes for this email
         await db.password_resets.delete_many({"email": email})
@@ -172,8 +172,8 @@ class OTPService:
         reset_doc = {
             "user_id": str(user["_id"]),
             "email": email,
-            "reset_code": reset_code,
-            "created_at": datetime.utcnow(),
+            "reset_hash": OTPService._hash_code(reset_code),
+            "created_at": now,
             "expires_at": expires_at,
             "is_used": False,
             "attempts": 0
@@ -203,46 +203,31 @@ class OTPService:
         """
         db = get_database()
         
-        # Find reset code
-        reset_doc = await db.password_resets.find_one({
-            "email": email,
-            "is_used": False
-        })
-        
-        if not reset_doc:
-            logger.warning(f"No active reset code found for {email}")
-            return False
-        
-        # Check expiration
-        if datetime.utcnow() > reset_doc["expires_at"]:
-            logger.warning(f"Expired reset code for {email}")
-            await db.password_resets.delete_one({"_id": reset_doc["_id"]})
-            return False
-        
-        # Check attempts
-        if reset_doc["attempts"] >= max_attempts:
-            logger.warning(f"Too many reset attempts for {email}")
-            await db.password_resets.delete_one({"_id": reset_doc["_id"]})
-            return False
-        
-        # Verify code
-        if reset_doc["reset_code"] == reset_code:
-            # Don't mark as used yet - will be marked when password is actually reset
-            # Just reset attempts counter on successful verification
-            await db.password_resets.update_one(
-                {"_id": reset_doc["_id"]},
-                {"$set": {"attempts": 0}}
-            )
+        # Match by hash in a single atomic indexed query
+        # Don't mark as used yet - that happens when the password is actually
+        # reset - just clear the attempts counter on success
+        reset_doc = await db.password_resets.find_one_and_update(
+            {
+                "email": email,
+                "reset_hash": OTPService._hash_code(reset_code),
+                "is_used": False,
+                "expires_at": {"$gt": datetime.now(timezone.utc)},
+                "attempts": {"$lt": max_attempts}
+            },
+            {"$set": {"attempts": 0}}
+        )
+        
+        if reset_doc:
             logger.info(f"Reset code verified successfully for {email}")
             return True
-        else:
-            # Increment attempts
-            await db.password_resets.update_one(
-                {"_id": reset_doc["_id"]},
-                {"$inc": {"attempts": 1}}
-            )
-            logger.warning(f"Invalid reset code attempt for {email}")
-            return False
+        
+        # Wrong/expired code - count the attempt against any active reset code
+        await db.password_resets.update_one(
+            {"email": email, "is_used": False},
+            {"$inc": {"attempts": 1}}
+        )
+        logger.warning(f"Invalid reset code attempt for {email}")
+        return False
     
     @staticmethod
     async def cleanup_expired() -> int:
@@ -254,7 +239,7 @@ class OTPService:
             int: Number of expired records removed
         """
         db = get_database()
-        now = datetime.utcnow()
+        now = datetime.now(timezone.utc)
         
         # Clean expired OTPs
         otp_result = await db.otps.delete_many({"expires_at": {"$lt": now}})
@@ -3,33 +3,317 @@ RAG (Retrieval Augmented Generation) Service
 Combines semantic search with LLM for accurate answers
 """
 
+import asyncio
+import re
+import threading
+import time
+
+import numpy as np
+
 from typing import Dict, List, Optional
 from app.services.vectorStore import vector_store
 from app.config import settings
 
+# Hard ceiling on a full RAG round trip so slow LLM calls can't pile up
+RAG_TIMEOUT_SECONDS = 15
+
+# Lenient distance cutoff for better recall, and how many docs go to the LLM
+RELEVANCE_DISTANCE_THRESHOLD = 1.2
+MAX_CONTEXT_DOCS = 5
+
+# When even the best match is this far away, generation is unlikely to help -
+# skip the LLM call and tell the user to rephrase
+LOW_CONFIDENCE_DISTANCE = 1.0
+
+# Request coalescing: questions arriving within this window share one Gemini
+# call; the window is only held open once a second question is already waiting
+COALESCE_WINDOW_SECONDS = 0.05
+COALESCE_MAX_BATCH = 4
+
+# Answer delimiters the model is asked to emit in a coalesced call
+_BATCH_ANSWER_RE = re.compile(r"ANSWER\s+(\d+)\s*:", re.IGNORECASE)
+
+# Shared LLM clients - one instance (and one underlying channel) per
+# process, no matter how many RAGService objects get constructed; each is
+# created on first use so the unused backend allocates nothing
+_GEMINI_MODEL = None
+_GEMINI_LOCK = threading.Lock()
+
+_OPENAI_CLIENT = None
+_OPENAI_LOCK = threading.Lock()
+
+OPENAI_MODEL_NAME = "gpt-3.5-turbo"
+
+
+def _get_gemini_model():
+    """Lazily create and cache the process-wide GenerativeModel"""
+    global _GEMINI_MODEL
+    if _GEMINI_MODEL is None:
+        with _GEMINI_LOCK:
+            if _GEMINI_MODEL is None:
+                import google.generativeai as genai
+                genai.configure(api_key=settings.GEMINI_API_KEY)
+                _GEMINI_MODEL = genai.GenerativeModel('models/gemini-2.5-flash')
+    return _GEMINI_MODEL
+
+
+def _get_openai_client():
+    """Lazily create and cache the process-wide OpenAI client"""
+    global _OPENAI_CLIENT
+    if _OPENAI_CLIENT is None:
+        with _OPENAI_LOCK:
+            if _OPENAI_CLIENT is None:
+                from openai import OpenAI
+                _OPENAI_CLIENT = OpenAI(api_key=settings.OPENAI_API_KEY)
+    return _OPENAI_CLIENT
+
+
+# Static halves of the LLM prompt - built once instead of per call
+_PROMPT_PREFIX = "You are a helpful assistant for college placement information. Use the context below to answer the question accurately."
+
+_PROMPT_SUFFIX = """CRITICAL FORMATTING RULES:
+1. Use **bold headings** with emojis: **## 📊 Title**
+2. ALWAYS add a blank line after each section
+3. ALWAYS add a blank line before each new heading
+4. Use markdown tables for branch-wise data
+5. Add blank line after tables
+6. Use **bold** for numbers
+
+Table format:
+| Branch | Placed | Placement % | Highest CTC | Average CTC |
+|--------|--------|-------------|-------------|-------------|
+| CSE    |153/203 | 75.37%      | 33.0 LPA    | 9.31 LPA |
+
+EXAMPLE OUTPUT FORMAT:
+
+**## 📊 Overall Statistics**
+
+• Total Students: **1027**
+• Students Placed: **658**
+
+**## 💼 Branch-wise Placement Data**
+
+[Table here]
+
+**## 🏆 Key Insights**
+
+• Best branch: CIVIL **83.87%**
+
+Remember: Blank line after EVERY section!
+
+Answer:"""
+
+
+class SemanticCache:
+    """
+    In-process cache keyed by query embedding
+    Near-duplicate questions (cosine similarity >= threshold) reuse the
+    previous answer, skipping both vector search and the LLM call
+    """
+
+    def __init__(self, max_entries: int = 128, threshold: float = 0.97, ttl_seconds: int = 3600):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._embeddings: Optional[np.ndarray] = None  # [N, d] unit-norm float32
+        self._entries: List[Dict] = []  # parallel: {'expires_at': float, 'result': Dict}
+        self._next_slot = 0  # ring-buffer write position once full
+
+    def get(self, embedding: np.ndarray) -> Optional[Dict]:
+        """Return the cached result for the closest stored query, if any"""
+        if not self._entries:
+            self.misses += 1
+            return None
+
+        sims = self._embeddings[:len(self._entries)] @ embedding
+        best = int(np.argmax(sims))
+
+        if sims[best] >= self.threshold and self._entries[best]['expires_at'] > time.monotonic():
+            self.hits += 1
+            return self._entries[best]['result']
+
+        self.misses += 1
+        return None
+
+    def put(self, embedding: np.ndarray, result: Dict):
+        """Store a result, overwriting the oldest entry when full"""
+        entry = {'expires_at': time.monotonic() + self.ttl_seconds, 'result': result}
+
+        if self._embeddings is None:
+            self._embeddings = np.zeros((self.max_entries, embedding.shape[0]), dtype=np.float32)
+
+        if len(self._entries) < self.max_entries:
+            self._embeddings[len(self._entries)] = embedding
+            self._entries.append(entry)
+        else:
+            self._embeddings[self._next_slot] = embedding
+            self._entries[self._next_slot] = entry
+            self._next_slot = (self._next_slot + 1) % self.max_entries
+
+
+class _QueryCoalescer:
+    """
+    Merges questions that arrive within a short window into one Gemini call
+    A lone question is dispatched immediately - the window is only held open
+    once a second question is already queued, so idle traffic pays no latency
+    """
+
+    def __init__(self, service: "RAGService"):
+        self._service = service
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def submit(self, question: str, n_results: int) -> Dict:
+        """Enqueue a question and wait for its (possibly batched) answer"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain())
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((question, n_results, future))
+        return await future
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+
+            # Take whatever is already waiting without delay
+            while len(batch) < COALESCE_MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            # With a batch already forming, hold the window open briefly so
+            # near-simultaneous arrivals can join it
+            if 1 < len(batch) < COALESCE_MAX_BATCH:
+                deadline = loop.time() + COALESCE_WINDOW_SECONDS
+                while len(batch) < COALESCE_MAX_BATCH:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+            items = [(question, n_results) for question, n_results, _ in batch]
+            try:
+                results = await asyncio.wait_for(
+                    loop.run_in_executor(None, lambda: self._service._answer_batch(items)),
+                    timeout=RAG_TIMEOUT_SECONDS
+                )
+            except Exception as exc:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
 class RAGService:
-    def __init__(self):
+    def __init__(self, cache_enabled: bool = True):
         """Initialize RAG service with Gemini (preferred) or OpenAI"""
         # Always use Gemini if available (better for this use case)
-        gemini_key = settings.GEMINI_API_KEY
-        self.use_openai = False
-        
-        if gemini_key:
-            # Use Gemini
-            import google.generativeai as genai
-            genai.configure(api_key=gemini_key)
-            self.gemini_model = genai.GenerativeModel('models/gemini-2.5-flash')
+        self.use_openai = not settings.GEMINI_API_KEY
+
+        # Pick the generation backends once instead of branching per query
+        self._generate = self._generate_with_openai if self.use_openai else self._generate_with_gemini
+        self._stream_generate = self._stream_with_openai if self.use_openai else self._stream_with_gemini
+
+        self.cache_enabled = cache_enabled
+        self.semantic_cache = SemanticCache()
+        self.low_confidence_skips = 0  # LLM calls avoided on weak retrievals
+        self._warmed_up = False
+        self._coalescer = _QueryCoalescer(self)
+
+    @property
+    def gemini_model(self):
+        """Shared Gemini model, created on first access (nothing when on OpenAI)"""
+        return _get_gemini_model()
+
+    @property
+    def client(self):
+        """Shared OpenAI client, created on first access (nothing when on Gemini)"""
+        return _get_openai_client()
+
+    def _start_gemini_warmup(self):
+        """
+        Warm the Gemini HTTP channel (DNS + TLS handshake) in the background
+        so it overlaps with embedding and vector search on the first query
+        """
+        if self._warmed_up or self.use_openai:
+            return
+        self._warmed_up = True
+
+        def _warm():
+            try:
+                self.gemini_model.count_tokens("warmup")
+            except Exception:
+                pass  # Best effort - the real call will establish the channel
+
+        threading.Thread(target=_warm, daemon=True, name="gemini-warmup").start()
+
+    async def aquery(self, question: str, n_results: int = 10) -> Dict:
+        """
+        Async entry point for query()
+        Runs the blocking pipeline in a worker thread so the event loop keeps
+        serving other requests, coalescing near-simultaneous questions into a
+        single Gemini call; the round trip carries a hard timeout
+        """
+        return await self._coalescer.submit(question, n_results)
+
+    def _embed_question(self, question: str) -> np.ndarray:
+        """Embed the raw question as a unit-norm float32 vector for caching"""
+        if vector_store.embedding_service is None:
+            from app.ml.embeddings import EmbeddingService
+            vector_store.embedding_service = EmbeddingService()
+        embedding = np.asarray(vector_store.embedding_service.embed_text(question), dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
 
-    
     def query(self, question: str, n_results: int = 10) -> Dict:
         """
         Answer question using improved RAG
-        1. Retrieve MORE relevant context from vector store
-        2. Filter by relevance
-        3. Generate answer using LLM with context
+        1. Check the semantic cache for a near-duplicate question
+        2. Retrieve MORE relevant context from vector store
+        3. Filter by relevance
+        4. Generate answer using LLM with context
         """
-        
+        result, state = self._prepare(question, n_results)
+        if result is not None:
+            return result
+
+        question_embedding, search_results, prompt = state
+        answer = self._generate(prompt)
+        return self._finish(question_embedding, search_results, answer)
+
+    def _prepare(self, question: str, n_results: int):
+        """
+        Run cache lookup, retrieval, and relevance filtering - everything
+        except the LLM call
+        Returns (result, None) when the pipeline short-circuits with a
+        finished response, otherwise (None, (embedding, search_results,
+        prompt)) for the caller to generate against
+        """
+        # Step 0: Semantic cache - near-duplicate questions skip search + LLM
+        question_embedding = None
+        if self.cache_enabled:
+            question_embedding = self._embed_question(question)
+            cached = self.semantic_cache.get(question_embedding)
+            if cached is not None:
+                return cached, None
+
         # Step 1: Retrieve more results for better coverage
+        # (warm the Gemini connection in parallel with retrieval)
+        self._start_gemini_warmup()
         search_results = vector_store.search(question, n_results=n_results)
         
         if not search_results['documents'] or len(search_results['documents']) == 0:
@@ -37,106 +321,223 @@ class RAGService:
                 'answer': "I couldn't find relevant information in the placement database. Could you rephrase your question or be more specific?",
                 'sources': [],
                 'confidence': 'low'
-            }
-        
-        # Step 2: Filter by relevance score (keep more lenient threshold)
-        filtered_docs = []
-        filtered_metadata = []
-        filtered_distances = []
-        
-        for doc, metadata, distance in zip(
-            search_results['documents'], 
-            search_results['metadatas'], 
-            search_results['distances']
-        ):
-            if distance < 1.2:  # More lenient threshold for better recall
-                filtered_docs.append(doc)
-                filtered_metadata.append(metadata)
-                filtered_distances.append(distance)
+            }, None
         
-        if not filtered_docs:
+        # Step 2: Filter by relevance score
+        # Results arrive distance-sorted, so the threshold cut is a binary
+        # search and the top-k filter collapses to three slices
+        distances = np.asarray(search_results['distances'])
+        cut = min(int(np.searchsorted(distances, RELEVANCE_DISTANCE_THRESHOLD)), MAX_CONTEXT_DOCS)
+
+        if cut == 0:
             return {
                 'answer': "I found some related information, but it may not directly answer your question. Could you be more specific?",
                 'sources': search_results['metadatas'][:2] if search_results['metadatas'] else [],
                 'confidence': 'low'
-            }
+            }, None
+
+        search_results['documents'] = search_results['documents'][:cut]
+        search_results['metadatas'] = search_results['metadatas'][:cut]
+        search_results['distances'] = search_results['distances'][:cut]
         
-        # Use top 5 most relevant docs
-        search_results['documents'] = filtered_docs[:5]
-        search_results['metadatas'] = filtered_metadata[:5]
-        search_results['distances'] = filtered_distances[:5]
+        # Even the best match is weak - a verbose Gemini answer built on it
+        # would mislead more than help, so skip the (dominant-cost) LLM call
+        if search_results['distances'][0] > LOW_CONFIDENCE_DISTANCE:
+            self.low_confidence_skips += 1
+            return {
+                'answer': "I'm not confident the placement database covers this. Could you rephrase your question or be more specific?",
+                'sources': search_results['metadatas'][:2],
+                'confidence': 'low'
+            }, None
         
-        # Step 2: Build context from retrieved documents
+        # Step 3: Build the prompt from retrieved documents
         context = self._build_context(search_results)
-        
-        # Step 3: Generate answer with LLM
         prompt = self._build_prompt(question, context)
-        
-        if self.use_openai:
-            answer = self._generate_with_openai(prompt)
-        else:
-            answer = self._generate_with_gemini(prompt)
-        
-        return {
+        return None, (question_embedding, search_results, prompt)
+
+    def _finish(self, question_embedding, search_results: Dict, answer: str) -> Dict:
+        """Assemble the response dict and feed the semantic cache"""
+        result = {
             'answer': answer,
             'sources': search_results['metadatas'],
             'retrieved_documents': search_results['documents'],
             'confidence': 'high' if search_results['distances'][0] < 0.5 else 'medium'
         }
+
+        if self.cache_enabled and question_embedding is not None:
+            self.semantic_cache.put(question_embedding, result)
+
+        return result
+
+    def _answer_batch(self, items: List[tuple]) -> List[Dict]:
+        """
+        Answer several (question, n_results) pairs, sharing one Gemini call
+        across all of them that survive the retrieval short-circuits
+        """
+        results: List[Optional[Dict]] = [None] * len(items)
+        pending = []  # (index, embedding, search_results, prompt)
+
+        for idx, (question, n_results) in enumerate(items):
+            result, state = self._prepare(question, n_results)
+            if result is not None:
+                results[idx] = result
+            else:
+                pending.append((idx, *state))
+
+        if not pending:
+            return results
+
+        if len(pending) == 1:
+            idx, embedding, search_results, prompt = pending[0]
+            results[idx] = self._finish(embedding, search_results, self._generate(prompt))
+            return results
+
+        answers = self._generate_batch([entry[3] for entry in pending])
+        for (idx, embedding, search_results, _), answer in zip(pending, answers):
+            results[idx] = self._finish(embedding, search_results, answer)
+        return results
+
+    def _generate_batch(self, prompts: List[str]) -> List[str]:
+        """
+        One Gemini round trip for several prepared prompts
+        Falls back to per-prompt calls if the model ignores the numbered
+        answer format
+        """
+        sections = [f"QUESTION {i}:\n{prompt}" for i, prompt in enumerate(prompts, 1)]
+        composite = (
+            "Answer each of the numbered questions below independently. "
+            "Start every answer on its own line with 'ANSWER <number>:'.\n\n"
+            + "\n\n====\n\n".join(sections)
+        )
+
+        text = self._generate(composite)
+        answers = self._split_batch_answers(text, len(prompts))
+        if answers is None:
+            return [self._generate(prompt) for prompt in prompts]
+        return answers
+
+    @staticmethod
+    def _split_batch_answers(text: str, expected: int) -> Optional[List[str]]:
+        """Split a coalesced response on ANSWER <n>: markers (None on mismatch)"""
+        matches = list(_BATCH_ANSWER_RE.finditer(text))
+        if len(matches) != expected:
+            return None
+
+        answers = []
+        for j, match in enumerate(matches):
+            end = matches[j + 1].start() if j + 1 < len(matches) else len(text)
+            answers.append(text[match.end():end].strip())
+        return answers
     
-    def _build_context(self, search_results: Dict) -> str:
-        """Build context string from search results"""
-        contexts = []
-        for i, (doc, metadata) in enumerate(zip(search_results['documents'], search_results['metadatas'])):
-            contexts.append(f"[Source {i+1}]\n{doc}\n")
-        
-        return "\n".join(contexts)
-    
-    def _build_prompt(self, question: str, context: str) -> str:
-        """Build prompt for LLM"""
-        return f"""You are a helpful assistant for college placement information. Use the context below to answer the question accurately.
+    def query_stream(self, question: str, n_results: int = 10):
+        """
+        Streaming variant of query()
+        Yields answer chunks as Gemini produces them so the caller can show
+        text at first-token latency, then a final chunk carrying sources and
+        confidence. Retrieval, filtering, and caching mirror query().
+        """
+        question_embedding = None
+        if self.cache_enabled:
+            question_embedding = self._embed_question(question)
+            cached = self.semantic_cache.get(question_embedding)
+            if cached is not None:
+                yield {'content': cached['answer'], 'done': False}
+                yield {
+                    'content': '',
+                    'done': True,
+                    'sources': cached.get('sources', []),
+                    'confidence': cached['confidence'],
+                    'cached': True
+                }
+                return
 
-Context:
-{context}
+        self._start_gemini_warmup()
+        search_results = vector_store.search(question, n_results=n_results)
 
-Question: {question}
+        if not search_results['documents'] or len(search_results['documents']) == 0:
+            yield {
+                'content': "I couldn't find relevant information in the placement database. Could you rephrase your question or be more specific?",
+                'done': True,
+                'sources': [],
+                'confidence': 'low'
+            }
+            return
 
-CRITICAL FORMATTING RULES:
-1. Use **bold headings** with emojis: **## 📊 Title**
-2. ALWAYS add a blank line after each section
-3. ALWAYS add a blank line before each new heading
-4. Use markdown tables for branch-wise data
-5. Add blank line after tables
-6. Use **bold** for numbers
+        # Results arrive distance-sorted, so the threshold cut is a binary
+        # search and the top-k filter collapses to three slices
+        distances = np.asarray(search_results['distances'])
+        cut = min(int(np.searchsorted(distances, RELEVANCE_DISTANCE_THRESHOLD)), MAX_CONTEXT_DOCS)
 
-Table format:
-| Branch | Placed | Placement % | Highest CTC | Average CTC |
-|--------|--------|-------------|-------------|-------------|
-| CSE    |153/203 | 75.37%      | 33.0 LPA    | 9.31 LPA |
+        if cut == 0:
+            yield {
+                'content': "I found some related information, but it may not directly answer your question. Could you be more specific?",
+                'done': True,
+                'sources': search_results['metadatas'][:2] if search_results['metadatas'] else [],
+                'confidence': 'low'
+            }
+            return
 
-EXAMPLE OUTPUT FORMAT:
+        search_results['documents'] = search_results['documents'][:cut]
+        search_results['metadatas'] = search_results['metadatas'][:cut]
+        search_results['distances'] = search_results['distances'][:cut]
 
-**## 📊 Overall Statistics**
+        if search_results['distances'][0] > LOW_CONFIDENCE_DISTANCE:
+            self.low_confidence_skips += 1
+            yield {
+                'content': "I'm not confident the placement database covers this. Could you rephrase your question or be more specific?",
+                'done': True,
+                'sources': search_results['metadatas'][:2],
+                'confidence': 'low'
+            }
+            return
 
-• Total Students: **1027**
-• Students Placed: **658**
+        context = self._build_context(search_results)
+        prompt = self._build_prompt(question, context)
 
-**## 💼 Branch-wise Placement Data**
+        # Stream tokens as they arrive instead of blocking on the full
+        # answer; _stream_generate is bound to the configured backend
+        parts = []
+        for text in self._stream_generate(prompt):
+            parts.append(text)
+            yield {'content': text, 'done': False}
 
-[Table here]
+        result = {
+            'answer': ''.join(parts),
+            'sources': search_results['metadatas'],
+            'retrieved_documents': search_results['documents'],
+            'confidence': 'high' if search_results['distances'][0] < 0.5 else 'medium'
+        }
 
-**## 🏆 Key Insights**
+        if self.cache_enabled and question_embedding is not None:
+            self.semantic_cache.put(question_embedding, result)
 
-• Best branch: CIVIL **83.87%**
+        yield {
+            'content': '',
+            'done': True,
+            'sources': result['sources'],
+            'confidence': result['confidence']
+        }
 
-Remember: Blank line after EVERY section!
+    def _build_context(self, search_results: Dict) -> str:
+        """Build context string from search results via one flat buffer"""
+        buf = []
+        append = buf.append  # local name saves an attribute lookup per chunk
+        for i, doc in enumerate(search_results['documents'], 1):
+            append("[Source ")
+            append(str(i))
+            append("]\n")
+            append(doc)
+            append("\n\n")
+        return "".join(buf)
 
-Answer:"""
+    def _build_prompt(self, question: str, context: str) -> str:
+        """Build prompt for LLM - only context and question vary per call"""
+        return f"{_PROMPT_PREFIX}\n\nContext:\n{context}\n\nQuestion: {question}\n\n{_PROMPT_SUFFIX}"
     
     def _generate_with_openai(self, prompt: str) -> str:
         """Generate answer using OpenAI"""
         response = self.client.chat.completions.create(
-            model=self.model,
+            model=OPENAI_MODEL_NAME,
             messages=[
                 {"role": "system", "content": "You are a helpful placement information assistant."},
                 {"role": "user", "content": prompt}
@@ -151,5 +552,29 @@ Answer:"""
         response = self.gemini_model.generate_content(prompt)
         return response.text
 
-# Global instance
+    def _stream_with_openai(self, prompt: str):
+        """Yield answer text chunks from OpenAI as they arrive"""
+        response = self.client.chat.completions.create(
+            model=OPENAI_MODEL_NAME,
+            messages=[
+                {"role": "system", "content": "You are a helpful placement information assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=500,
+            stream=True
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _stream_with_gemini(self, prompt: str):
+        """Yield answer text chunks from Gemini as they arrive"""
+        for chunk in self.gemini_model.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+# Global instance - warm the shared Gemini channel right away so the first
+# user query doesn't pay the connection setup cost
 rag_service = RAGService()
+rag_service._start_gemini_warmup()
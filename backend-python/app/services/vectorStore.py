@@ -1,24 +1,64 @@
 """
 Vector Store Service using ChromaDB
 Stores and retrieves document embeddings
+Small collections are mirrored into RAM and searched brute-force
 """
 
+import re
+import threading
+from collections import OrderedDict
+
 import chromadb
 from chromadb.config import Settings
+import numpy as np
 from typing import List, Dict, Optional
 from app.ml.embeddings import EmbeddingService
 import json
 import os
 
+# Optional SIMD-accelerated distance kernels - numpy BLAS is the fallback
+try:
+    import simsimd
+    _HAS_SIMSIMD = True
+except ImportError:
+    _HAS_SIMSIMD = False
+
+# Below this count a single in-RAM matmul beats Chroma's HNSW + SQLite path
+BRUTE_FORCE_MAX_DOCS = 50_000
+
+# For collections above this size, run the coarse scoring pass over the int8
+# matrix (4x smaller, better cache residency) and re-rank the survivors in
+# float32; below it the two-pass split costs more than it saves
+INT8_MIN_DOCS = 1024
+
+# Synonym expansion: trigger keyword -> expansion terms, matched in a single
+# precompiled regex pass instead of repeated substring scans
+_SYNONYMS = {
+    'placement': ['placement', 'recruitment', 'company', 'package', 'salary'],
+    'job': ['placement', 'recruitment', 'company', 'package', 'salary'],
+    'recruit': ['placement', 'recruitment', 'company', 'package', 'salary'],
+    'exam': ['examination', 'test', 'assessment'],
+    'test': ['examination', 'test', 'assessment'],
+}
+_TRIGGER_RE = re.compile("|".join(map(re.escape, _SYNONYMS)), re.IGNORECASE)
+
+# Exact-repeat queries (refresh, re-ask) skip the transformer entirely
+EMBED_CACHE_MAX_ENTRIES = 1024
+
+# Content-hashed document IDs: <base>_<16-hex blake2b digest>. The base
+# pins the source document, the digest pins its text - IDs without this
+# shape (announcements, kb entries, ...) never match
+_HASHED_ID_RE = re.compile(r'^(?P<base>.+)_[0-9a-f]{16}$')
+
 class VectorStore:
     def __init__(self, persist_directory: str = "./chroma_db"):
         """Initialize ChromaDB client"""
         # Ensure directory exists
         os.makedirs(persist_directory, exist_ok=True)
-        
+
         # Lazy load embedding service
         self.embedding_service = None
-        
+
         self.client = chromadb.PersistentClient(
             path=persist_directory,
             settings=Settings(
@@ -26,82 +66,320 @@ class VectorStore:
                 allow_reset=True
             )
         )
-        
+
         # Get or create collection for placements
         self.placement_collection = self.client.get_or_create_collection(
             name="placement_data",
             metadata={"description": "Placement statistics and information"}
         )
-    
+
+        # In-RAM mirror of the collection for the brute-force hot path.
+        # _mirror_loaded records whether the mirror holds the FULL
+        # collection; when loading was declined (too large, bad shape) the
+        # mirror must stay unused or it would silently shadow most of the
+        # stored documents
+        self._mirror_loaded = False
+        self._matrix: Optional[np.ndarray] = None  # [N, d] unit-norm float32
+        self._matrix_i8: Optional[np.ndarray] = None  # [N, d] int8 quantized
+        self._ids: List[str] = []
+        self._id_set: set = set()
+        self._docs: List[str] = []
+        self._metas: List[Dict] = []
+        self._load_matrix()
+
+        # Cached document count - count() is a SQLite COUNT(*) under the
+        # hood and this value gets polled by health checks
+        self._doc_count = self.placement_collection.count()
+
+        # LRU of normalized query embeddings keyed by exact question text
+        # (search may run from a FastAPI threadpool, hence the lock)
+        self._embed_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._embed_cache_lock = threading.Lock()
+
+        # Serializes mirror updates so batch uploads can run concurrently;
+        # embedding and the Chroma write themselves stay outside the lock
+        self._write_lock = threading.Lock()
+
+    def _load_matrix(self):
+        """Mirror collection embeddings into a contiguous normalized matrix"""
+        count = self.placement_collection.count()
+        if count > BRUTE_FORCE_MAX_DOCS:
+            return
+        if count == 0:
+            # Nothing to fetch, but an empty mirror is a complete mirror -
+            # appends may build on it
+            self._mirror_loaded = True
+            return
+
+        data = self.placement_collection.get(include=["embeddings", "documents", "metadatas"])
+        embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+        if embeddings.ndim != 2:
+            return
+
+        self._matrix = self._normalize_rows(embeddings)
+        self._matrix_i8 = self._quantize(self._matrix)
+        self._ids = list(data["ids"])
+        self._id_set = set(self._ids)
+        self._docs = list(data["documents"])
+        self._metas = list(data["metadatas"])
+        self._mirror_loaded = True
+
+    @staticmethod
+    def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+        """L2-normalize rows, leaving zero vectors untouched"""
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    @staticmethod
+    def _quantize(matrix: np.ndarray) -> np.ndarray:
+        """Quantize unit-norm vectors to int8 (components are within [-1, 1])"""
+        return np.clip(np.round(matrix * 127), -127, 127).astype(np.int8)
+
+    def _append_to_matrix(self, ids: List[str], embeddings: List, texts: List[str], metadatas: List[Dict]):
+        """Keep the in-RAM mirror in sync with writes to Chroma"""
+        if not self._mirror_loaded:
+            # The mirror never held the full collection - appending would
+            # create a partial copy that search() mistakes for the whole
+            # thing; leave all reads on Chroma instead
+            return
+        new_rows = self._normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        if self._matrix is None:
+            self._matrix = new_rows
+        else:
+            self._matrix = np.vstack([self._matrix, new_rows])
+        self._matrix_i8 = self._quantize(self._matrix)
+        self._ids.extend(ids)
+        self._id_set.update(ids)
+        self._docs.extend(texts)
+        self._metas.extend(metadatas)
+
     def add_document(self, doc_id: str, text: str, metadata: Dict):
         """Add document to vector store"""
         if self.embedding_service is None:
             self.embedding_service = EmbeddingService()
         embedding = self.embedding_service.embed_text(text)
-        
+
         self.placement_collection.add(
             ids=[doc_id],
             embeddings=[embedding],
             documents=[text],
             metadatas=[metadata]
         )
-    
-    def add_documents_batch(self, documents: List[Dict]):
-        """Add multiple documents"""
+        with self._write_lock:
+            self._append_to_matrix([doc_id], [embedding], [text], [metadata])
+            self._doc_count += 1
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed raw texts with the store's (lazily created) embedding service"""
         if self.embedding_service is None:
             self.embedding_service = EmbeddingService()
+        return self.embedding_service.embed_batch(texts)
+
+    def add_documents_batch(self, documents: List[Dict], embeddings=None):
+        """Add multiple documents, embedding them unless vectors are supplied"""
         ids = [doc['id'] for doc in documents]
         texts = [doc['text'] for doc in documents]
         metadatas = [doc['metadata'] for doc in documents]
-        
-        embeddings = self.embedding_service.embed_batch(texts)
-        
+
+        # embed_batch returns a contiguous ndarray - hand it to Chroma as-is
+        # (one buffer copy) instead of exploding it into a list of lists
+        if embeddings is None:
+            embeddings = self.embed_texts(texts)
+        else:
+            embeddings = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
+
         self.placement_collection.add(
             ids=ids,
             embeddings=embeddings,
             documents=texts,
             metadatas=metadatas
         )
-    
+        with self._write_lock:
+            self._append_to_matrix(ids, embeddings, texts, metadatas)
+            self._doc_count += len(documents)
+
     def search(self, query: str, n_results: int = 10) -> Dict:
         """Search for similar documents with improved retrieval"""
         if self.embedding_service is None:
             self.embedding_service = EmbeddingService()
-        
-        # Expand query with related terms for better matching
-        expanded_query = self._expand_query(query)
-        query_embedding = self.embedding_service.embed_text(expanded_query)
-        
-        # Search with more results for better coverage
+
+        query_embedding = self._embed_query(query)
+
+        # Brute-force path: one matmul over the RAM mirror for small collections
+        if self._mirror_loaded and self._matrix is not None and len(self._ids) <= BRUTE_FORCE_MAX_DOCS:
+            return self._brute_force_search(query_embedding, n_results)
+
+        # Fall back to Chroma for large collections
         results = self.placement_collection.query(
             query_embeddings=[query_embedding],
             n_results=n_results
         )
-        
+
         return {
             'ids': results['ids'][0] if results['ids'] else [],
             'documents': results['documents'][0] if results['documents'] else [],
             'metadatas': results['metadatas'][0] if results['metadatas'] else [],
             'distances': results['distances'][0] if results['distances'] else []
         }
-    
-    def _expand_query(self, query: str) -> str:
-        """Expand query with synonyms for better matching"""
-        query_lower = query.lower()
+
+    def _embed_query(self, query: str) -> np.ndarray:
+        """Embed a query, reusing the cached vector for exact-repeat text"""
+        with self._embed_cache_lock:
+            cached = self._embed_cache.get(query)
+            if cached is not None:
+                self._embed_cache.move_to_end(query)
+                return cached
+
+        # Expand query with related terms for better matching
+        expansions = self._expand_query(query)
+        if expansions:
+            # One batched forward pass for the raw and expanded query, then
+            # mean-pool - cheaper than two sequential encodes and blends both
+            expanded_query = ' '.join([query, *expansions])
+            embeddings = np.asarray(
+                self.embedding_service.embed_batch([query, expanded_query]),
+                dtype=np.float32
+            )
+            query_embedding = embeddings.mean(axis=0)
+            norm = np.linalg.norm(query_embedding)
+            if norm > 0:
+                query_embedding = query_embedding / norm
+        else:
+            query_embedding = np.asarray(self.embedding_service.embed_text(query), dtype=np.float32)
+
+        with self._embed_cache_lock:
+            self._embed_cache[query] = query_embedding
+            if len(self._embed_cache) > EMBED_CACHE_MAX_ENTRIES:
+                self._embed_cache.popitem(last=False)
+
+        return query_embedding
+
+    def _brute_force_search(self, query_embedding: np.ndarray, n_results: int) -> Dict:
+        """Top-k over the in-RAM matrix, on the same distance scale as Chroma"""
+        norm = np.linalg.norm(query_embedding)
+        if norm > 0:
+            query_embedding = query_embedding / norm
+
+        total = len(self._ids)
+        k = min(n_results, total)
+
+        if total > INT8_MIN_DOCS:
+            # Coarse pass over the int8 matrix (int32 accumulation), then
+            # exact float32 cosine on a small candidate set
+            query_i8 = self._quantize(query_embedding).astype(np.int32)
+            coarse = self._matrix_i8 @ query_i8
+            n_candidates = min(4 * k, total)
+            candidates = np.argpartition(-coarse, n_candidates - 1)[:n_candidates]
+
+            sims = self._matrix[candidates] @ query_embedding
+            order = np.argsort(-sims)[:k]
+            top = candidates[order]
+            # Chroma reports squared L2; for unit vectors that's 2 * (1 - cos)
+            distances = 2.0 * (1.0 - sims[order])
+            return {
+                'ids': [self._ids[i] for i in top],
+                'documents': [self._docs[i] for i in top],
+                'metadatas': [self._metas[i] for i in top],
+                'distances': [float(d) for d in distances]
+            }
+
+        if _HAS_SIMSIMD:
+            cos_dist = np.asarray(simsimd.cdist(query_embedding[None, :], self._matrix, metric="cos"))[0]
+        else:
+            cos_dist = 1.0 - self._matrix @ query_embedding
+
+        # Chroma reports squared L2; for unit vectors that's 2 * cosine distance
+        distances = 2.0 * cos_dist
+
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+
+        return {
+            'ids': [self._ids[i] for i in top],
+            'documents': [self._docs[i] for i in top],
+            'metadatas': [self._metas[i] for i in top],
+            'distances': [float(distances[i]) for i in top]
+        }
+
+    def _expand_query(self, query: str) -> List[str]:
+        """Collect synonym expansions for the query (empty when none match)"""
+        hits = {m.group(0).lower() for m in _TRIGGER_RE.finditer(query)}
+        if not hits:
+            return []
+
         expansions = []
-        
-        # Placement synonyms
-        if any(word in query_lower for word in ['placement', 'job', 'recruit']):
-            expansions.extend(['placement', 'recruitment', 'company', 'package', 'salary'])     
-        # Academic synonyms
-        if any(word in query_lower for word in ['exam', 'test']):
-            expansions.extend(['examination', 'test', 'assessment'])      
-        # Return expanded query
-        return query + ' ' + ' '.join(expansions)
-    
+        for hit in hits:
+            for term in _SYNONYMS[hit]:
+                if term not in expansions:
+                    expansions.append(term)
+        return expansions
+
+    def prune_superseded(self, ids: List[str]) -> int:
+        """Delete stored entries superseded by content-hashed IDs in `ids`
+
+        When a document's text changes its content-hash suffix changes
+        with it, so the fresh ID no longer matches the stored one; any
+        stored entry sharing a base prefix with an incoming ID but
+        carrying a different digest is a stale version and is removed
+        (from Chroma and the RAM mirror) so searches never return old and
+        new statistics side by side
+        """
+        current = {}
+        for doc_id in ids:
+            match = _HASHED_ID_RE.match(doc_id)
+            if match:
+                current.setdefault(match.group('base'), set()).add(doc_id)
+        if not current:
+            return 0
+
+        if self._mirror_loaded:
+            candidates = list(self._ids)
+        else:
+            # No mirror to consult - one ids-only fetch per batch is the
+            # price of correctness on oversized collections
+            candidates = self.placement_collection.get(include=[])['ids']
+
+        stale = [
+            stored for stored in candidates
+            if (match := _HASHED_ID_RE.match(stored))
+            and match.group('base') in current
+            and stored not in current[match.group('base')]
+        ]
+        if not stale:
+            return 0
+
+        self.placement_collection.delete(ids=stale)
+        stale_set = set(stale)
+        with self._write_lock:
+            if self._mirror_loaded:
+                keep = [i for i, stored in enumerate(self._ids) if stored not in stale_set]
+                if len(keep) != len(self._ids):
+                    if self._matrix is not None:
+                        self._matrix = np.ascontiguousarray(self._matrix[keep])
+                        self._matrix_i8 = self._quantize(self._matrix)
+                    self._ids = [self._ids[i] for i in keep]
+                    self._id_set.difference_update(stale_set)
+                    self._docs = [self._docs[i] for i in keep]
+                    self._metas = [self._metas[i] for i in keep]
+            self._doc_count -= len(stale)
+        return len(stale)
+
+    def existing_ids(self, ids: List[str]) -> set:
+        """Which of the given IDs are already stored (one membership pass)"""
+        if self._mirror_loaded:
+            return {doc_id for doc_id in ids if doc_id in self._id_set}
+        found = self.placement_collection.get(ids=list(ids), include=[])
+        return set(found['ids'])
+
     def get_collection_count(self) -> int:
-        """Get number of documents in collection"""
-        return self.placement_collection.count()
+        """Get number of documents in collection (cached, O(1))"""
+        return self._doc_count
+
+    def refresh_collection_count(self) -> int:
+        """Re-read the count from Chroma in case of external writers"""
+        self._doc_count = self.placement_collection.count()
+        return self._doc_count
 
 # Global instance
 vector_store = VectorStore()
@@ -4,8 +4,19 @@ DEFAULT_HEADERS = {
     "User-Agent": "Mozilla/5.0 (CampusAura AI)"
 }
 
+# Shared client - keepalive connections amortize DNS/TLS across requests
+# instead of paying for a fresh pool on every fetch
+_CLIENT = httpx.AsyncClient(
+    timeout=5,
+    headers=DEFAULT_HEADERS,
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=100)
+)
+
 async def fetch_text(url: str, timeout: int = 5) -> str:
-    async with httpx.AsyncClient(timeout=timeout, headers=DEFAULT_HEADERS) as client:
-        r = await client.get(url)
-        r.raise_for_status()
-        return r.text
+    r = await _CLIENT.get(url, timeout=timeout)
+    r.raise_for_status()
+    return r.text
+
+async def close_client():
+    """Close the shared client (called from the app shutdown hook)"""
+    await _CLIENT.aclose()
@@ -4,81 +4,163 @@ Indexes: placements, announcements, documents, timetables, knowledge_base, etc.
 """
 
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
 from app.services.vectorStore import vector_store
+from indexers.placements import build_placement_docs_frame
+from app.config import settings
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import hashlib
+import numpy as np
 import os
+import threading
 from dotenv import load_dotenv
+from itertools import islice
 import json
-from datetime import datetime
+from datetime import datetime, timezone
 
 load_dotenv()
 
 # Connect to MongoDB
 MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
-client = MongoClient(MONGODB_URI)
+# Wire compression roughly halves BSON for the text-heavy collections
+# (server permitting); the scripts touch one collection at a time, so a
+# modest pool is plenty
+client = MongoClient(MONGODB_URI, compressors='zstd,zlib,snappy', maxPoolSize=20)
 db = client['campusaura']
 
+# Chroma handles mid-sized batches best; oversized ones also hold every
+# pending embedding in RAM at once
+# Also used as the Mongo cursor batch size so BSON arrives in bounded
+# chunks rather than one oversized response
+BATCH_SIZE = int(os.getenv('INDEX_BATCH_SIZE', '200'))
+
+# In-flight batch uploads; beyond 2 the GIL serializes the gains away
+UPLOAD_CONCURRENCY = 2
+
+
+def batched(iterable, size):
+    """Yield lists of up to `size` items without materializing the source"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+# Only these fields feed the searchable text - projecting them server-side
+# keeps large unused blobs out of the BSON responses entirely
+PLACEMENT_PROJECTION = {
+    'extractedData.overall_statistics': 1,
+    'extractedData.salary_packages': 1,
+    'extractedData.branch_wise_statistics': 1,
+}
+
+# Docs with no extracted statistics would index as walls of "N/A" - filter
+# them server-side so they never reach the builders or the embedder
+PLACEMENT_FILTER = {'extractedData.overall_statistics': {'$exists': True}}
+
+# Announcements need a real title and body to be worth a vector slot
+ANNOUNCEMENT_FILTER = {
+    'title': {'$nin': [None, '']},
+    'content': {'$nin': [None, '']},
+}
+
+# Set per run for incremental mode; merged into every collection query
+INCREMENTAL_FILTER = {}
+
+
+def _filter(base):
+    """Merge a collection's base filter with the incremental window"""
+    if INCREMENTAL_FILTER:
+        return {**base, **INCREMENTAL_FILTER}
+    return base
+
+ANNOUNCEMENT_PROJECTION = {
+    'title': 1, 'content': 1, 'category': 1,
+    'priority': 1, 'targetAudience': 1, 'date': 1,
+}
+
+# The large text fields get truncated for indexing anyway - do the slice
+# server-side ($substrCP, Unicode-safe) so only the kept prefix crosses the
+# wire instead of megabyte extractions
+DOCUMENT_PROJECTION = {
+    'filename': 1, 'title': 1, 'description': 1,
+    'category': 1, 'tags': 1,
+    'extractedText': {'$substrCP': [{'$ifNull': ['$extractedText', '']}, 0, 1000]},
+}
+
+KNOWLEDGE_BASE_PROJECTION = {
+    'title': 1, 'url': 1, 'category': 1,
+    'content': {'$substrCP': [{'$ifNull': ['$content', '']}, 0, 2000]},
+}
+
+TIMETABLE_PROJECTION = {'branch': 1, 'section': 1, 'semester': 1, 'schedule': 1}
+
+
+def _cache_key(text):
+    """Embedding-cache key: content hash scoped to the embedding model"""
+    return f"{settings.EMBEDDINGS_MODEL}:{hashlib.sha256(text.encode()).hexdigest()}"
+
+
+def add_batch_with_cache(batch):
+    """
+    Submit one batch, embedding only texts whose content hash is not
+    already in db.embedding_cache - re-runs over unchanged data skip the
+    transformer entirely
+    """
+    # A changed document arrives under a fresh content-hash ID; drop the
+    # stored entries it supersedes before (not after) the early-return so
+    # legacy stale versions get cleaned even when nothing new is added
+    vector_store.prune_superseded([doc['id'] for doc in batch])
+
+    # Content-hashed IDs make unchanged documents detectable up front -
+    # anything already stored is dropped before touching the embedder
+    already_stored = vector_store.existing_ids([doc['id'] for doc in batch])
+    if already_stored:
+        batch = [doc for doc in batch if doc['id'] not in already_stored]
+        if not batch:
+            return
+
+    keys = [_cache_key(doc['text']) for doc in batch]
+    vectors = {
+        row['_id']: row['vector']
+        for row in db.embedding_cache.find({'_id': {'$in': keys}})
+    }
+
+    misses = [i for i, key in enumerate(keys) if key not in vectors]
+    if misses:
+        fresh = vector_store.embed_texts([batch[i]['text'] for i in misses])
+        for j, i in enumerate(misses):
+            vectors[keys[i]] = fresh[j]
+        try:
+            db.embedding_cache.insert_many(
+                [{'_id': keys[i], 'vector': fresh[j].tolist()}
+                 for j, i in enumerate(misses)
+                 # a batch can repeat a text; write each key once
+                 if keys.index(keys[i]) == i],
+                ordered=False
+            )
+        except BulkWriteError:
+            pass  # another upload worker cached the same text first
+
+    embeddings = np.asarray([vectors[key] for key in keys], dtype=np.float32)
+    vector_store.add_documents_batch(batch, embeddings=embeddings)
+
+
 def index_placements():
-    """Index placement documents"""
-    placements = list(db.placements.find({}))
-    if not placements:
-        return []
-    
-    documents = []
-    for placement in placements:
-        doc_id = f"placement_{placement['_id']}"
-        text_parts = []
-        
-        # Basic info
-        text_parts.append(f"Document Type: Placement Statistics")
-        text_parts.append(f"Batch Year: {placement.get('extractedData', {}).get('overall_statistics', {}).get('batch_year', 'N/A')}")
-        
-        # Overall statistics
-        overall = placement.get('extractedData', {}).get('overall_statistics', {})
-        text_parts.append(f"""
-Overall Placement Statistics:
-- Total Students: {overall.get('total_students_enrolled', 'N/A')}
-- Students Placed: {overall.get('total_students_placed', 'N/A')}
-- Placement Percentage: {overall.get('overall_placement_percentage', 'N/A')}%
-- Total Companies: {overall.get('total_companies', 'N/A')}
-- Total Offers: {overall.get('total_job_offers', 'N/A')}
-        """)
-        
-        # Salary info
-        salaries = placement.get('extractedData', {}).get('salary_packages', {})
-        text_parts.append(f"""
-Salary Packages:
-- Highest: {salaries.get('highest_salary_lpa', 'N/A')} LPA
-- Average: {salaries.get('average_salary_lpa', 'N/A')} LPA
-- Median: {salaries.get('median_salary_lpa', 'N/A')} LPA
-        """)
-        
-        # Branch-wise data
-        branches = placement.get('extractedData', {}).get('branch_wise_statistics', [])
-        if branches:
-            text_parts.append("\nBranch-wise Placement Data:")
-            for branch in branches:
-                text_parts.append(f"{branch.get('branch')}: {branch.get('placement_percentage')}% placed, Avg CTC: {branch.get('average_ctc_lpa')} LPA")
-        
-        documents.append({
-            'id': doc_id,
-            'text': "\n".join(text_parts),
-            'metadata': {
-                'type': 'placement',
-                'batch_year': placement.get('extractedData', {}).get('overall_statistics', {}).get('batch_year', ''),
-                'category': 'placements'
-            }
-        })
-    
-    return documents
+    """Yield placement documents (bulk-built via the pandas fast path)"""
+    cursor = db.placements.find(_filter(PLACEMENT_FILTER), projection=PLACEMENT_PROJECTION).batch_size(BATCH_SIZE)
+    # One frame per batch keeps the vectorized build but avoids
+    # materializing the whole collection the way a single frame over the
+    # full cursor would
+    for batch in batched(cursor, BATCH_SIZE):
+        yield from build_placement_docs_frame(batch)
+
 
 def index_announcements():
-    """Index announcements"""
-    announcements = list(db.announcements.find({}))
-    if not announcements:
-        return []
-    
-    documents = []
-    for announcement in announcements:
+    """Yield announcements"""
+    for announcement in db.announcements.find(_filter(ANNOUNCEMENT_FILTER), projection=ANNOUNCEMENT_PROJECTION).batch_size(BATCH_SIZE):
         doc_id = f"announcement_{announcement['_id']}"
         text_parts = []
         
@@ -94,7 +176,7 @@ def index_announcements():
         if announcement.get('date'):
             text_parts.append(f"Date: {announcement.get('date')}")
         
-        documents.append({
+        yield {
             'id': doc_id,
             'text': "\n".join(text_parts),
             'metadata': {
@@ -102,18 +184,11 @@ def index_announcements():
                 'category': announcement.get('category', ''),
                 'priority': announcement.get('priority', '')
             }
-        })
-    
-    return documents
+        }
 
 def index_documents():
-    """Index uploaded documents"""
-    docs = list(db.documents.find({}))
-    if not docs:
-        return []
-    
-    documents = []
-    for doc in docs:
+    """Yield uploaded documents"""
+    for doc in db.documents.find(_filter({}), projection=DOCUMENT_PROJECTION).batch_size(BATCH_SIZE):
         doc_id = f"document_{doc['_id']}"
         text_parts = []
         
@@ -126,11 +201,11 @@ def index_documents():
         if doc.get('tags'):
             text_parts.append(f"Tags: {', '.join(doc.get('tags', []))}")
         
-        # Extract text content if available
+        # Extract text content if available (already truncated server-side)
         if doc.get('extractedText'):
-            text_parts.append(f"\nContent:\n{doc.get('extractedText', '')[:1000]}")
+            text_parts.append(f"\nContent:\n{doc.get('extractedText', '')}")
         
-        documents.append({
+        yield {
             'id': doc_id,
             'text': "\n".join(text_parts),
             'metadata': {
@@ -138,18 +213,11 @@ def index_documents():
                 'category': doc.get('category', ''),
                 'filename': doc.get('filename', '')
             }
-        })
-    
-    return documents
+        }
 
 def index_knowledge_base():
-    """Index knowledge base (scraped website content)"""
-    kb_items = list(db.knowledge_base.find({}))
-    if not kb_items:
-        return []
-    
-    documents = []
-    for item in kb_items:
+    """Yield knowledge base items (scraped website content)"""
+    for item in db.knowledge_base.find(_filter({}), projection=KNOWLEDGE_BASE_PROJECTION).batch_size(BATCH_SIZE):
         doc_id = f"kb_{item['_id']}"
         text_parts = []
         
@@ -158,14 +226,13 @@ def index_knowledge_base():
         text_parts.append(f"URL: {item.get('url', 'N/A')}")
         
         if item.get('content'):
-            # Limit content to avoid token overflow
-            content = item.get('content', '')[:2000]
-            text_parts.append(f"\nContent:\n{content}")
+            # Already limited server-side to avoid token overflow
+            text_parts.append(f"\nContent:\n{item.get('content', '')}")
         
         if item.get('category'):
             text_parts.append(f"Category: {item.get('category')}")
         
-        documents.append({
+        yield {
             'id': doc_id,
             'text': "\n".join(text_parts),
             'metadata': {
@@ -173,18 +240,11 @@ def index_knowledge_base():
                 'url': item.get('url', ''),
                 'category': item.get('category', '')
             }
-        })
-    
-    return documents
+        }
 
 def index_timetables():
-    """Index timetables"""
-    timetables = list(db.timetables.find({}))
-    if not timetables:
-        return []
-    
-    documents = []
-    for timetable in timetables:
+    """Yield timetables"""
+    for timetable in db.timetables.find(_filter({}), projection=TIMETABLE_PROJECTION).batch_size(BATCH_SIZE):
         doc_id = f"timetable_{timetable['_id']}"
         text_parts = []
         
@@ -199,7 +259,7 @@ def index_timetables():
             for day, classes in timetable.get('schedule', {}).items():
                 text_parts.append(f"{day}: {', '.join([c.get('subject', '') for c in classes])}")
         
-        documents.append({
+        yield {
             'id': doc_id,
             'text': "\n".join(text_parts),
             'metadata': {
@@ -207,69 +267,112 @@ def index_timetables():
                 'branch': timetable.get('branch', ''),
                 'section': timetable.get('section', '')
             }
-        })
-    
-    return documents
+        }
 
-def index_all_data():
-    """Index all data from all collections"""
+def index_all_data(since=None):
+    """Index all data from all collections (only docs updated after `since`
+    when given - O(delta) instead of O(corpus) for scheduled re-runs)"""
+    global INCREMENTAL_FILTER
+    
+    # Recorded before the run so documents updated while it executes fall
+    # into the next incremental window instead of being skipped
+    started_at = datetime.now(timezone.utc)
+    # Not every collection maintains updatedAt (announcements and documents
+    # never set it) - docs without the field always pass the window, and the
+    # content-hashed ID dedup keeps re-processing them cheap, rather than
+    # being silently dropped from every incremental run
+    INCREMENTAL_FILTER = {'$or': [
+        {'updatedAt': {'$gt': since}},
+        {'updatedAt': {'$exists': False}},
+    ]} if since else {}
     
     print("=" * 80)
     print("🌍 UNIVERSAL DATA INDEXING - ALL COLLECTIONS")
     print("=" * 80)
     print(f"\nDatabase: campusaura")
     print(f"Target: Vector Store (ChromaDB)")
+    print(f"Batch size: {BATCH_SIZE}")
+    if since:
+        print(f"Incremental: documents updated after {since.isoformat()}")
     print("\n" + "=" * 80 + "\n")
     
-    all_documents = []
-    
-    # Index each collection
-    print("📊 Indexing Placements...")
-    placement_docs = index_placements()
-    all_documents.extend(placement_docs)
-    print(f"   ✓ {len(placement_docs)} placement documents prepared")
-    
-    print("\n📢 Indexing Announcements...")
-    announcement_docs = index_announcements()
-    all_documents.extend(announcement_docs)
-    print(f"   ✓ {len(announcement_docs)} announcement documents prepared")
+    sources = [
+        ('📊 Placements', 'placements', index_placements),
+        ('📢 Announcements', 'announcements', index_announcements),
+        ('📄 Documents', 'documents', index_documents),
+        ('🌐 Knowledge Base', 'knowledge_base', index_knowledge_base),
+        ('📅 Timetables', 'timetables', index_timetables),
+    ]
+    counts = {}
     
-    print("\n📄 Indexing Documents...")
-    document_docs = index_documents()
-    all_documents.extend(document_docs)
-    print(f"   ✓ {len(document_docs)} uploaded documents prepared")
-    
-    print("\n🌐 Indexing Knowledge Base (Web Content)...")
-    kb_docs = index_knowledge_base()
-    all_documents.extend(kb_docs)
-    print(f"   ✓ {len(kb_docs)} knowledge base items prepared")
+    # Backpressure on the upload queue: a collector must win a permit
+    # before it pulls the next batch off its cursor, so no more than
+    # 2 * UPLOAD_CONCURRENCY batches ever wait for an upload slot
+    in_flight = threading.BoundedSemaphore(2 * UPLOAD_CONCURRENCY)
+    uploads = []
+
+    def upload(batch):
+        """Index one batch, then hand its backpressure permit back"""
+        try:
+            add_batch_with_cache(batch)
+        finally:
+            in_flight.release()
+
+    def collect(label, generate):
+        """Stream one collection's generator into upload batches
+        (runs on a worker thread)"""
+        count = 0
+        for batch in batched(generate(), BATCH_SIZE):
+            in_flight.acquire()
+            uploads.append(uploader.submit(upload, batch))
+            count += len(batch)
+        print(f"{label}: ✓ {count} documents prepared")
+        return count
+
+    # The five collection reads are independent and I/O-bound, so run them
+    # concurrently (PyMongo's client is thread-safe) - wall time becomes
+    # max(collection) instead of the sum. Each collector submits
+    # Chroma-friendly fixed-size batches as its cursor yields them, gated
+    # by the semaphore above, so peak memory is the in-flight batches plus
+    # one batch per collector regardless of corpus size.
+    # Keeping a couple of uploads in flight lets one batch's embedding
+    # compute overlap with another's Chroma commit
+    total = 0
+    with ThreadPoolExecutor(max_workers=len(sources)) as executor, \
+         ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY, thread_name_prefix='upload') as uploader:
+        futures = {
+            executor.submit(collect, label, generate): key
+            for label, key, generate in sources
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            counts[key] = future.result()
+            total += counts[key]
+
+        for done, upload_future in enumerate(as_completed(uploads), 1):
+            upload_future.result()  # surface upload errors
+            print(f"   📥 Uploaded batch {done}/{len(uploads)}")
     
-    print("\n📅 Indexing Timetables...")
-    timetable_docs = index_timetables()
-    all_documents.extend(timetable_docs)
-    print(f"   ✓ {len(timetable_docs)} timetable documents prepared")
+    db.indexing_state.update_one(
+        {'_id': 'last_run'},
+        {'$set': {'timestamp': started_at}},
+        upsert=True
+    )
     
-    # Index all documents
-    if not all_documents:
+    if total == 0:
         print("\n❌ No documents found to index!")
         return
     
-    print(f"\n" + "=" * 80)
-    print(f"📥 Indexing {len(all_documents)} total documents into vector store...")
-    print("=" * 80)
-    
-    vector_store.add_documents_batch(all_documents)
-    
-    print(f"\n✅ Successfully indexed {len(all_documents)} documents!")
+    print(f"\n✅ Successfully indexed {total} documents!")
     print(f"📊 Vector store now contains {vector_store.get_collection_count()} documents total")
     
     # Show breakdown
     print(f"\n📈 Breakdown by Type:")
-    print(f"   • Placements: {len(placement_docs)}")
-    print(f"   • Announcements: {len(announcement_docs)}")
-    print(f"   • Documents: {len(document_docs)}")
-    print(f"   • Knowledge Base: {len(kb_docs)}")
-    print(f"   • Timetables: {len(timetable_docs)}")
+    print(f"   • Placements: {counts['placements']}")
+    print(f"   • Announcements: {counts['announcements']}")
+    print(f"   • Documents: {counts['documents']}")
+    print(f"   • Knowledge Base: {counts['knowledge_base']}")
+    print(f"   • Timetables: {counts['timetables']}")
     
     print("\n" + "=" * 80)
     print("🔍 Example Queries You Can Try:")
@@ -296,4 +399,21 @@ def index_all_data():
     print("=" * 80)
 
 if __name__ == "__main__":
-    index_all_data()
+    # Incremental mode is opt-in: a plain run always walks the full corpus
+    # (cheaply, thanks to the content-hash dedup), so collections without
+    # an updatedAt field can never fall out of the index by default
+    parser = argparse.ArgumentParser(description="Index all collections into the vector store")
+    parser.add_argument('--since', metavar='TIMESTAMP',
+                        help="ISO timestamp; only index documents updated after it")
+    parser.add_argument('--incremental', action='store_true',
+                        help="like --since with the last recorded run's timestamp")
+    args = parser.parse_args()
+    
+    since = None
+    if args.since:
+        since = datetime.fromisoformat(args.since)
+    elif args.incremental:
+        state = db.indexing_state.find_one({'_id': 'last_run'})
+        since = state['timestamp'] if state else None
+    
+    index_all_data(since=since)
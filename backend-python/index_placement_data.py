@@ -5,132 +5,148 @@ Run this once to populate the vector database
 
 from pymongo import MongoClient
 from app.services.vectorStore import vector_store
+from indexers.placements import build_placement_doc
 import os
+import queue
+import threading
+from multiprocessing import Pool
 from dotenv import load_dotenv
+from loguru import logger
 import json
 
 load_dotenv()
 
 # Connect to MongoDB
 MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
-client = MongoClient(MONGODB_URI)
+# Wire compression roughly halves BSON for the text-heavy collections
+# (server permitting); the scripts touch one collection at a time, so a
+# modest pool is plenty
+client = MongoClient(MONGODB_URI, compressors='zstd,zlib,snappy', maxPoolSize=20)
 db = client['campusaura']
 
+# Documents submitted to the vector store per call
+BATCH_SIZE = int(os.getenv('INDEX_BATCH_SIZE', '200'))
+
+# Placements the text builder reads - projected server-side
+PLACEMENT_PROJECTION = {
+    'extractedData': 1, 'fileType': 1, 'category': 1, 'filename': 1,
+}
+
+# Skip docs with no extracted statistics - they would index as "N/A" noise
+PLACEMENT_FILTER = {'extractedData.overall_statistics': {'$exists': True}}
+
+_DONE = object()  # end-of-stream marker between pipeline stages
+
+# Console progress cadence; per-document detail only at debug level
+PROGRESS_EVERY = 500
+
+# Worker processes for text assembly; above 1 the build stage sidesteps the
+# GIL via multiprocessing (only worth it when profiling shows the Python
+# text build, not I/O or embedding, dominating)
+INDEX_PROCESSES = int(os.getenv('INDEX_PROCESSES', '1'))
+
+
+def _build_full_doc(placement):
+    """Top-level (picklable) wrapper for the pool workers"""
+    return build_placement_doc(placement, detail_level='full')
+
 def index_placements():
     """Index all placement documents"""
     
     print("📊 Indexing Placement Data into Vector Store\n")
     print("=" * 60)
     
-    placements = list(db.placements.find({}))
-    
-    if not placements:
-        print("❌ No placement data found!")
-        return
-    
-    print(f"Found {len(placements)} placement documents\n")
+    # Three-stage pipeline over bounded queues: MongoDB reads, text
+    # assembly, and embedding/indexing overlap instead of running serially,
+    # and memory stays capped at a couple of batches regardless of corpus
+    # size
+    raw_queue = queue.Queue(maxsize=2 * BATCH_SIZE)
+    doc_queue = queue.Queue(maxsize=2 * BATCH_SIZE)
+    # First exception raised inside a stage thread; the sentinel still goes
+    # on the queue (finally) so the main thread wakes up instead of blocking
+    # forever on get(), then re-raises this so the script exits non-zero
+    stage_errors = []
+
+    def read_placements():
+        """Stage 1: stream raw placements out of MongoDB"""
+        try:
+            cursor = db.placements.find(PLACEMENT_FILTER, projection=PLACEMENT_PROJECTION).batch_size(BATCH_SIZE)
+            for placement in cursor:
+                raw_queue.put(placement)
+        except Exception as e:
+            stage_errors.append(e)
+        finally:
+            raw_queue.put(_DONE)
+
+    def build_documents():
+        """Stage 2: turn raw placements into vector-store documents"""
+        built = 0
+        try:
+            while True:
+                placement = raw_queue.get()
+                if placement is _DONE:
+                    return
+                doc = build_placement_doc(placement, detail_level='full')
+                # Per-document lines each pay a stdout write and dominate large
+                # runs; keep them at debug level and print a throttled counter
+                logger.debug("Prepared: {} ({} chars)", placement.get('filename', 'Unknown'), len(doc['text']))
+                built += 1
+                if built % PROGRESS_EVERY == 0:
+                    print(f"   ... {built} documents prepared")
+                doc_queue.put(doc)
+        except Exception as e:
+            stage_errors.append(e)
+        finally:
+            doc_queue.put(_DONE)
     
-    documents_to_index = []
+    def submit(batch):
+        """Index one batch, skipping content-hashed IDs already stored"""
+        ids = [doc['id'] for doc in batch]
+        # Changed documents carry fresh content hashes - remove the stored
+        # versions they supersede so old and new text never coexist
+        vector_store.prune_superseded(ids)
+        already_stored = vector_store.existing_ids(ids)
+        if already_stored:
+            batch = [doc for doc in batch if doc['id'] not in already_stored]
+        if batch:
+            vector_store.add_documents_batch(batch)
+        return len(batch)
     
-    for placement in placements:
-        doc_id = str(placement['_id'])
-        
-        # Build searchable text content
-        text_parts = []
-        
-        # Add basic info
-        text_parts.append(f"Batch Year: {placement.get('extractedData', {}).get('overall_statistics', {}).get('batch_year', 'N/A')}")
-        
-        # Add overall statistics
-        overall = placement.get('extractedData', {}).get('overall_statistics', {})
-        text_parts.append(f"""
-Overall Placement Statistics:
-- Total Students: {overall.get('total_students_enrolled', 'N/A')}
-- Students Placed: {overall.get('total_students_placed', 'N/A')}
-- Placement Percentage: {overall.get('overall_placement_percentage', 'N/A')}%
-- Total Companies: {overall.get('total_companies', 'N/A')}
-- Total Offers: {overall.get('total_job_offers', 'N/A')}
-        """)
-        
-        # Add salary info
-        salaries = placement.get('extractedData', {}).get('salary_packages', {})
-        text_parts.append(f"""
-Salary Packages:
-- Highest: {salaries.get('highest_salary_lpa', 'N/A')} LPA
-- Average: {salaries.get('average_salary_lpa', 'N/A')} LPA
-- Median: {salaries.get('median_salary_lpa', 'N/A')} LPA
-- Lowest: {salaries.get('lowest_salary_lpa', 'N/A')} LPA
-        """)
-        
-        # Add branch-wise data
-        branches = placement.get('extractedData', {}).get('branch_wise_statistics', [])
-        if branches:
-            text_parts.append("\nBranch-wise Placement Data:")
-            for branch in branches:
-                text_parts.append(f"""
-{branch.get('branch', 'N/A')}:
-- Students Registered: {branch.get('students_registered', 'N/A')}
-- Students Placed: {branch.get('students_placed', 'N/A')}
-- Placement Percentage: {branch.get('placement_percentage', 'N/A')}%
-- Highest CTC: {branch.get('highest_ctc_lpa', 'N/A')} LPA
-- Average CTC: {branch.get('average_ctc_lpa', 'N/A')} LPA
-                """)
-        
-        # Add historical trend
-        trends = placement.get('extractedData', {}).get('historical_trend', [])
-        if trends:
-            text_parts.append("\nHistorical Placement Trends:")
-            for trend in trends:
-                text_parts.append(f"Year {trend.get('year')}: {trend.get('students_placed')} placed out of {trend.get('students_enrolled')} ({trend.get('placement_percentage')}%)")
-        
-        # Add internship info
-        internships = placement.get('extractedData', {}).get('internship_statistics', {})
-        if internships:
-            text_parts.append("\nInternship Information:")
-            for year, data in internships.items():
-                text_parts.append(f"Year {year}: {data.get('total_internships')} internships, {data.get('paid_internships')} paid")
-        
-        # Add key insights
-        insights = placement.get('extractedData', {}).get('key_insights', {})
-        if insights:
-            text_parts.append("\nKey Insights:")
-            
-            best_branches = insights.get('best_performing_branches', [])
-            if best_branches:
-                text_parts.append("Best Performing Branches:")
-                for b in best_branches:
-                    text_parts.append(f"  - {b.get('branch')}: {b.get('placement_percentage')}%")
-            
-            highest_packages = insights.get('highest_average_packages', [])
-            if highest_packages:
-                text_parts.append("Highest Average Packages:")
-                for p in highest_packages:
-                    text_parts.append(f"  - {p.get('branch')}: {p.get('average_ctc_lpa')} LPA")
-            
-            top_offer = insights.get('top_salary_offer', {})
-            if top_offer:
-                text_parts.append(f"Top Salary Offer: {top_offer.get('branch')} branch - {top_offer.get('package_lpa')} LPA")
-        
-        full_text = "\n".join(text_parts)
-        
-        documents_to_index.append({
-            'id': doc_id,
-            'text': full_text,
-            'metadata': {
-                'batch_year': placement.get('extractedData', {}).get('overall_statistics', {}).get('batch_year', ''),
-                'document_type': placement.get('fileType', ''),
-                'category': placement.get('category', ''),
-                'filename': placement.get('filename', '')
-            }
-        })
-        
-        print(f"✓ Prepared: {placement.get('filename', 'Unknown')} ({len(full_text)} chars)")
+    def drain(documents):
+        """Final stage: index built documents in fixed-size batches"""
+        total = 0
+        # One preallocated buffer reused across batches - no per-batch list
+        # growth or reallocation (submit finishes before the next refill)
+        batch = [None] * BATCH_SIZE
+        filled = 0
+        for doc in documents:
+            batch[filled] = doc
+            filled += 1
+            if filled == BATCH_SIZE:
+                total += submit(batch)
+                filled = 0
+        if filled:
+            total += submit(batch[:filled])
+        return total
     
-    # Index all documents
-    print(f"\n📥 Indexing {len(documents_to_index)} documents...")
-    vector_store.add_documents_batch(documents_to_index)
+    if INDEX_PROCESSES > 1:
+        # CPU-bound build path: fan the text assembly out to worker
+        # processes; chunksize amortizes the pickling round trips
+        cursor = db.placements.find(PLACEMENT_FILTER, projection=PLACEMENT_PROJECTION).batch_size(BATCH_SIZE)
+        with Pool(processes=INDEX_PROCESSES) as pool:
+            total = drain(pool.imap(_build_full_doc, cursor, chunksize=64))
+    else:
+        threading.Thread(target=read_placements, daemon=True).start()
+        threading.Thread(target=build_documents, daemon=True).start()
+        total = drain(iter(doc_queue.get, _DONE))
+        if stage_errors:
+            raise stage_errors[0]
+
+    if total == 0:
+        print("❌ No placement data found!")
+        return
     
-    print(f"\n✅ Successfully indexed {len(documents_to_index)} placement documents!")
+    print(f"\n✅ Successfully indexed {total} placement documents!")
     print(f"📊 Vector store now contains {vector_store.get_collection_count()} documents")
     
     print("\n" + "=" * 60)
@@ -0,0 +1 @@
+"""Shared document builders for the indexing scripts"""
@@ -0,0 +1,267 @@
+"""
+Placement document builder shared by the indexing scripts
+index_all_data.py and index_placement_data.py used to carry near-identical
+copies of this text assembly; both now import build_placement_doc
+
+build_placement_docs_frame is the bulk variant: it flattens the cursor into
+a pandas frame once (structure-of-arrays) and assembles the scalar text
+sections with vectorized column concatenation instead of per-document dict
+traversal
+"""
+
+import hashlib
+
+import pandas as pd
+
+
+def _render_value(v):
+    """One value as text: 'N/A' for missing, integral floats without the .0
+
+    Both builders funnel every field through this, so a given document
+    renders identically (and hashes to the same content ID) whichever path
+    produced it. The float case matters because json_normalize coerces int
+    columns to float64 as soon as any row lacks the field - 1027 would
+    otherwise render as '1027.0' in the bulk path, and whether that happens
+    would depend on which OTHER documents are in the run. Rendering genuine
+    floats like 33.0 as '33' on both sides keeps the outputs in agreement
+    """
+    if v is None or pd.isna(v):
+        return 'N/A'
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+
+class _Fields(dict):
+    """format_map source rendering every field through _render_value
+    ('N/A' for missing ones) so the scalar and bulk builders agree"""
+
+    def __missing__(self, key):
+        return 'N/A'
+
+    def __getitem__(self, key):
+        return _render_value(super().__getitem__(key))
+
+
+# Section templates are built once at import; each document then costs one
+# format_map per section instead of dozens of per-field f-string appends
+_OVERALL_TEMPLATE = """
+Overall Placement Statistics:
+- Total Students: {total_students_enrolled}
+- Students Placed: {total_students_placed}
+- Placement Percentage: {overall_placement_percentage}%
+- Total Companies: {total_companies}
+- Total Offers: {total_job_offers}
+        """
+
+_SALARY_TEMPLATE = """
+Salary Packages:
+- Highest: {highest_salary_lpa} LPA
+- Average: {average_salary_lpa} LPA
+- Median: {median_salary_lpa} LPA"""
+
+_SALARY_LOWEST_LINE = "\n- Lowest: {lowest_salary_lpa} LPA"
+
+_BRANCH_FULL_TEMPLATE = """
+{branch}:
+- Students Registered: {students_registered}
+- Students Placed: {students_placed}
+- Placement Percentage: {placement_percentage}%
+- Highest CTC: {highest_ctc_lpa} LPA
+- Average CTC: {average_ctc_lpa} LPA
+                """
+
+_BRANCH_SUMMARY_TEMPLATE = "{branch}: {placement_percentage}% placed, Avg CTC: {average_ctc_lpa} LPA"
+
+_TREND_TEMPLATE = "Year {year}: {students_placed} placed out of {students_enrolled} ({placement_percentage}%)"
+
+_INTERNSHIP_TEMPLATE = "Year {year}: {total_internships} internships, {paid_internships} paid"
+
+_TOP_OFFER_TEMPLATE = "Top Salary Offer: {branch} branch - {package_lpa} LPA"
+
+# Section keys under extractedData, compiled once at import (a glom-style
+# spec without the dependency)
+_SECTION_SPEC = {
+    'overall': ('overall_statistics', {}),
+    'salaries': ('salary_packages', {}),
+    'branches': ('branch_wise_statistics', []),
+    'trends': ('historical_trend', []),
+    'internships': ('internship_statistics', {}),
+    'insights': ('key_insights', {}),
+}
+
+
+def extract_sections(placement):
+    """Resolve every section of the spec off a single extractedData binding"""
+    ed = placement.get('extractedData') or {}
+    return {
+        name: ed.get(key) or default
+        for name, (key, default) in _SECTION_SPEC.items()
+    }
+
+
+def build_placement_doc(placement, detail_level='full'):
+    """
+    Build a {id, text, metadata} vector-store document from a placement
+
+    detail_level='summary' produces the compact form used by the universal
+    indexer (short per-branch lines); 'full' adds detailed branch blocks,
+    historical trends, internship statistics, and key insights
+    """
+    full = detail_level == 'full'
+    sections = extract_sections(placement)
+    text_parts = []
+
+    if not full:
+        text_parts.append("Document Type: Placement Statistics")
+
+    overall = sections['overall']
+    batch_year = _render_value(overall.get('batch_year'))
+    text_parts.append(f"Batch Year: {batch_year}")
+    text_parts.append(_OVERALL_TEMPLATE.format_map(_Fields(overall)))
+
+    salary_template = _SALARY_TEMPLATE + _SALARY_LOWEST_LINE if full else _SALARY_TEMPLATE
+    text_parts.append(salary_template.format_map(_Fields(sections['salaries'])))
+
+    branches = sections['branches']
+    if branches:
+        branch_template = _BRANCH_FULL_TEMPLATE if full else _BRANCH_SUMMARY_TEMPLATE
+        text_parts.append("\nBranch-wise Placement Data:")
+        text_parts.append("\n".join(
+            branch_template.format_map(_Fields(branch)) for branch in branches
+        ))
+
+    if full:
+        trends = sections['trends']
+        if trends:
+            text_parts.append("\nHistorical Placement Trends:")
+            text_parts.append("\n".join(
+                _TREND_TEMPLATE.format_map(_Fields(trend)) for trend in trends
+            ))
+
+        internships = sections['internships']
+        if internships:
+            text_parts.append("\nInternship Information:")
+            text_parts.append("\n".join(
+                _INTERNSHIP_TEMPLATE.format_map(_Fields(data, year=year))
+                for year, data in internships.items()
+            ))
+
+        insights = sections['insights']
+        if insights:
+            text_parts.append("\nKey Insights:")
+
+            best_branches = insights.get('best_performing_branches', [])
+            if best_branches:
+                text_parts.append("Best Performing Branches:")
+                text_parts.append("\n".join(
+                    "  - {branch}: {placement_percentage}%".format_map(_Fields(b))
+                    for b in best_branches
+                ))
+
+            highest_packages = insights.get('highest_average_packages', [])
+            if highest_packages:
+                text_parts.append("Highest Average Packages:")
+                text_parts.append("\n".join(
+                    "  - {branch}: {average_ctc_lpa} LPA".format_map(_Fields(p))
+                    for p in highest_packages
+                ))
+
+            top_offer = insights.get('top_salary_offer', {})
+            if top_offer:
+                text_parts.append(_TOP_OFFER_TEMPLATE.format_map(_Fields(top_offer)))
+
+    if full:
+        doc_id = str(placement['_id'])
+        metadata = {
+            'batch_year': batch_year if batch_year != 'N/A' else '',
+            'document_type': placement.get('fileType', ''),
+            'category': placement.get('category', ''),
+            'filename': placement.get('filename', ''),
+        }
+    else:
+        doc_id = f"placement_{placement['_id']}"
+        metadata = {
+            'type': 'placement',
+            'batch_year': batch_year if batch_year != 'N/A' else '',
+            'category': 'placements',
+        }
+
+    text = "\n".join(text_parts)
+    return {
+        'id': f"{doc_id}_{content_hash(text)}",
+        'text': text,
+        'metadata': metadata,
+    }
+
+
+def content_hash(text):
+    """Short content digest appended to doc IDs so unchanged text keeps the
+    same ID across runs and can be skipped without re-embedding"""
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def _column(df, name):
+    """Render one flattened column as strings, with 'N/A' for missing values"""
+    if name not in df.columns:
+        return pd.Series(['N/A'] * len(df), index=df.index)
+    return df[name].map(_render_value)
+
+
+def build_placement_docs_frame(placements):
+    """
+    Bulk summary-form builder over a cursor or list of placements
+
+    json_normalize turns the nested documents into flat columns once; the
+    scalar sections are then built with a handful of vectorized string
+    concatenations, and only the variable-length branch section falls back
+    to a per-document loop. Every value renders through _render_value on
+    both paths, so output (text, metadata, and content-hash IDs) matches
+    build_placement_doc(..., detail_level='summary') exactly
+    """
+    placements = list(placements)
+    if not placements:
+        return []
+
+    df = pd.json_normalize(placements, sep='.')
+    prefix = 'extractedData.overall_statistics.'
+    salary = 'extractedData.salary_packages.'
+
+    batch_year = _column(df, prefix + 'batch_year')
+    texts = (
+        'Document Type: Placement Statistics\nBatch Year: ' + batch_year
+        + '\n\nOverall Placement Statistics:'
+        + '\n- Total Students: ' + _column(df, prefix + 'total_students_enrolled')
+        + '\n- Students Placed: ' + _column(df, prefix + 'total_students_placed')
+        + '\n- Placement Percentage: ' + _column(df, prefix + 'overall_placement_percentage') + '%'
+        + '\n- Total Companies: ' + _column(df, prefix + 'total_companies')
+        + '\n- Total Offers: ' + _column(df, prefix + 'total_job_offers')
+        + '\n        \n'
+        + '\nSalary Packages:'
+        + '\n- Highest: ' + _column(df, salary + 'highest_salary_lpa') + ' LPA'
+        + '\n- Average: ' + _column(df, salary + 'average_salary_lpa') + ' LPA'
+        + '\n- Median: ' + _column(df, salary + 'median_salary_lpa') + ' LPA'
+    )
+
+    # Size is known up front - preallocate instead of growing by append
+    documents = [None] * len(placements)
+    for i, placement in enumerate(placements):
+        text = texts.iloc[i]
+        branches = placement.get('extractedData', {}).get('branch_wise_statistics', [])
+        if branches:
+            text += '\n\nBranch-wise Placement Data:\n' + '\n'.join(
+                _BRANCH_SUMMARY_TEMPLATE.format_map(_Fields(branch)) for branch in branches
+            )
+
+        year = batch_year.iloc[i]
+        documents[i] = {
+            'id': f"placement_{placement['_id']}_{content_hash(text)}",
+            'text': text,
+            'metadata': {
+                'type': 'placement',
+                'batch_year': year if year != 'N/A' else '',
+                'category': 'placements',
+            }
+        }
+
+    return documents
@@ -3,32 +3,33 @@ FastAPI Backend with ML/NLP Integration
 Main application entry point
 """
 
-from fastapi import FastAPI, Request, status
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import importlib
+import json
 import uvicorn
 from loguru import logger
 import sys
 
 from app.config import settings
 from app.database import connect_db, close_db, seed_database, create_indexes, get_database
-# ML imports commented out until dependencies installed
-# from app.ml.content_classifier import ContentClassifier
-# from app.ml.embeddings import EmbeddingService
+from app.utils.async_http import close_client as close_http_client
+from app.ml.hybrid_chatbot import HybridChatbot
+from app.ml.embeddings import EmbeddingService
+from app.ml.content_classifier import ContentClassifier
 
-# Import routers
-from app.routes import auth, users, announcements, timetables, teacher_timetables, teacher_classes, documents, scraping, file_upload, cgpa, attendance, profile, knowledge_base  # , semanticSearch
 
-
-# Configure logging
+# Configure logging. enqueue=True hands writes to a background thread, so
+# request coroutines never block on a stdout write() (a synchronous syscall
+# that can stall the event loop when the pipe backs up under load)
 logger.remove()
 logger.add(
     sys.stdout,
     format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan> - <level>{message}</level>",
-    level="INFO"
+    level=settings.LOG_LEVEL,
+    enqueue=True
 )
 
 
@@ -50,30 +51,29 @@ async def lifespan(app: FastAPI):
     await seed_database()
     logger.info("✅ Database seeded")
     
-    # Initialize ML models (commented out until ML dependencies installed)
-    # logger.info("🤖 Loading ML models...")
-    # try:
-    #     app.state.classifier = ContentClassifier()
-    #     await app.state.classifier.load_model()
-    #     logger.info("✅ Content classifier loaded")
-    #     
-    #     app.state.embeddings = EmbeddingService()
-    #     await app.state.embeddings.load_model()
-    #     logger.info("✅ Embedding service loaded")
-    # except Exception as e:
-    #     logger.warning(f"⚠️ ML models not found: {e}")
-    #     app.state.classifier = ContentClassifier()
-    #     app.state.embeddings = EmbeddingService()
+    # Initialize ML services once per worker; the chat handler reuses these
+    # instead of constructing (and potentially loading model weights) per
+    # request
+    logger.info("🤖 Loading ML models...")
+    try:
+        app.state.classifier = ContentClassifier()
+        await app.state.classifier.load_model()
+        logger.info("✅ Content classifier loaded")
+
+        app.state.embeddings = EmbeddingService()
+        await app.state.embeddings.load_model()
+        logger.info("✅ Embedding service loaded")
+    except Exception as e:
+        logger.warning(f"⚠️ ML models not found: {e}")
+        app.state.classifier = ContentClassifier()
+        app.state.embeddings = EmbeddingService()
+
+    app.state.chatbot = HybridChatbot(
+        embeddings=app.state.embeddings,
+        classifier=app.state.classifier
+    )
     
-    logger.info(f"""
-╔════════════════════════════════════════════╗
-║   CampusAura Python Backend with ML/NLP    ║
-║   Running on: http://{settings.HOST}:{settings.PORT}   ║
-║   Environment: {settings.ENVIRONMENT}              ║
-║   MongoDB: Connected                       ║
-║   ML Models: Loaded                        ║
-╚════════════════════════════════════════════╝
-    """)
+    logger.info(_STARTUP_BANNER)
     
     yield
     
@@ -81,6 +81,19 @@ async def lifespan(app: FastAPI):
     logger.info("🛑 Shutting down CampusAura Backend")
     await close_db()
     logger.info("✅ MongoDB connection closed")
+    await close_http_client()
+
+
+# Startup banner, rendered once at import rather than per startup
+_STARTUP_BANNER = f"""
+╔════════════════════════════════════════════╗
+║   CampusAura Python Backend with ML/NLP    ║
+║   Running on: http://{settings.HOST}:{settings.PORT}   ║
+║   Environment: {settings.ENVIRONMENT}              ║
+║   MongoDB: Connected                       ║
+║   ML Models: Loaded                        ║
+╚════════════════════════════════════════════╝
+    """
 
 
 # Create FastAPI app
@@ -92,7 +105,49 @@ app = FastAPI(
 )
 
 
-# Security Middleware
+class ASGIExceptionHandler:
+    """
+    Last-resort exception guard working directly on scope/receive/send
+    Unlike an @app.exception_handler(Exception) (which rides Starlette's
+    request/response wrapping), this adds no per-request object
+    construction to the hot path
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = False
+
+        async def send_tracking(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_tracking)
+        except Exception as exc:
+            logger.error(f"Global exception: {exc}")
+            if started:
+                raise  # headers already sent - nothing sane left to emit
+            await send({
+                "type": "http.response.start",
+                "status": 500,
+                "headers": [(b"content-type", b"application/json")],
+            })
+            await send({
+                "type": "http.response.body",
+                "body": b'{"error": "Internal server error"}',
+            })
+
+
+# Security Middleware (CORSMiddleware is already pure ASGI; TrustedHost was
+# dropped - with allowed_hosts=["*"] it only added a per-request host scan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins_list,
@@ -101,38 +156,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.add_middleware(
-    TrustedHostMiddleware,
-    allowed_hosts=["*"]  # Configure based on your needs
-)
+app.add_middleware(ASGIExceptionHandler)
 
 
-# Global exception handler
-@app.exception_handler(Exception)
-async def global_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Global exception: {str(exc)}")
-    return JSONResponse(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        content={"error": "Internal server error"}
-    )
-
-
-# Health check endpoint
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    return {
+# Static endpoint payloads, serialized once at import; the handlers then
+# answer with a plain bytes write instead of re-encoding the same dict on
+# every poll
+_HEALTH_JSON = {
+    ml_loaded: json.dumps({
         "status": "ok",
         "environment": settings.ENVIRONMENT,
-        "ml_loaded": hasattr(app.state, 'classifier') and hasattr(app.state, 'embeddings')
-    }
-
+        "ml_loaded": ml_loaded,
+    }).encode()
+    for ml_loaded in (True, False)
+}
 
-# API Status endpoint
-@app.get("/api/status")
-async def api_status():
-    """Show available and pending API endpoints"""
-    return {
+_API_STATUS_RESPONSE = {
         "status": "running",
         "version": "1.0.0-minimal",
         "available_endpoints": {
@@ -163,89 +202,80 @@ async def api_status():
         "mongodb": "connected"
     }
 
+_API_STATUS_JSON = json.dumps(_API_STATUS_RESPONSE).encode()
 
-# Simple chat endpoint using Gemini API directly (without ML dependencies)
-@app.post("/api/chat")
-async def simple_chat(request: Request):
-    """Chat endpoint using Hybrid Chatbot with ML and knowledge base"""
-    try:
-        # Get message and context from request
-        body = await request.json()
-        user_message = body.get("message", "")
-        context = body.get("context", {})
-        
-        # Extract user information
-        user_role = context.get("role", "Guest")
-        user_name = context.get("name", "Guest")
-        user_data = context.get("data", {})  # Get the full user data including CGPA, attendance, etc.
-        
-        if not user_message:
-            return JSONResponse(
-                status_code=400,
-                content={"error": "Message is required"}
-            )
-        
-        # Use the hybrid chatbot
-        from app.ml.hybrid_chatbot import HybridChatbot
-        from app.ml.embeddings import EmbeddingService
-        from app.ml.content_classifier import ContentClassifier
-        
-        # Create ML services and hybrid chatbot
-        embeddings = EmbeddingService()
-        classifier = ContentClassifier()
-        chatbot = HybridChatbot(embeddings=embeddings, classifier=classifier)
-        
-        # Generate personalized response with full user context
-        result = await chatbot.generate_response(
-            message=user_message,
-            category=None,
-            user_role=user_role,
-            user_name=user_name,
-            user_data=user_data  # Pass the full user data
-        )
-        
-        logger.info(f"✓ Generated response using {result['metadata'].get('model', 'unknown')}")
-        
-        return JSONResponse(content=result)
-        
-    except Exception as e:
-        logger.error(f"Chat error: {str(e)}")
-        return JSONResponse(
-            status_code=500,
-            content={
-                "error": "Chat service error",
-                "message": str(e),
-                "fallback_response": "I'm having trouble processing your request. Please try again or contact support."
-            }
-        )
 
+# Health check endpoint
+@app.get("/health")
+async def health_check():
+    """Health check endpoint"""
+    ml_loaded = hasattr(app.state, 'classifier') and hasattr(app.state, 'embeddings')
+    return Response(content=_HEALTH_JSON[ml_loaded], media_type="application/json")
 
-# Mount static files for uploads
-app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
 
+# API Status endpoint
+@app.get("/api/status")
+async def api_status():
+    """Show available and pending API endpoints"""
+    return Response(content=_API_STATUS_JSON, media_type="application/json")
 
-# Include routers (only auth for now, others commented until implemented)
-app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
-app.include_router(users.router, tags=["Users"])
-app.include_router(announcements.router, tags=["Announcements"])
-app.include_router(timetables.router, tags=["Student Timetables"])
-app.include_router(teacher_timetables.router, tags=["Teacher Timetables"])
-app.include_router(teacher_classes.router, tags=["Teacher Classes"])  # No prefix - routes already include /api
-app.include_router(documents.router, prefix="/api", tags=["Documents"])
-app.include_router(scraping.router, tags=["Web Scraping"])
-app.include_router(file_upload.router, tags=["File Upload & Analysis"])
-app.include_router(cgpa.router, tags=["CGPA"])
-app.include_router(attendance.router, tags=["Attendance"])
-app.include_router(profile.router, tags=["User Profile"])
-app.include_router(knowledge_base.router, tags=["Knowledge Base"])
-# app.include_router(semanticSearch.router, tags=["Semantic Search & RAG"])  # Disabled - use hybrid chatbot with RAG integration
+
+# Mount static files for uploads. Behind nginx/CDN in production the mount
+# should not exist at all - every hit costs an os.stat plus open in this
+# process; check_dir=False also skips the startup stat on UPLOAD_DIR
+if settings.SERVE_UPLOADS_LOCAL:
+    app.mount(
+        "/uploads",
+        StaticFiles(directory=settings.UPLOAD_DIR, check_dir=False),
+        name="uploads"
+    )
+
+
+# Router registrations: module name, include_router kwargs. Importing via
+# importlib in a loop keeps one router's missing optional dependency from
+# taking the whole app down at boot, and lets the list double as the place
+# to disable a router (semanticSearch stays off - hybrid chatbot covers RAG)
+_ROUTERS = [
+    ("auth", {"prefix": "/api/auth", "tags": ["Authentication"]}),
+    ("chat", {"prefix": "/api", "tags": ["Chat"]}),
+    ("users", {"tags": ["Users"]}),
+    ("announcements", {"tags": ["Announcements"]}),
+    ("timetables", {"tags": ["Student Timetables"]}),
+    ("teacher_timetables", {"tags": ["Teacher Timetables"]}),
+    ("teacher_classes", {"tags": ["Teacher Classes"]}),  # No prefix - routes already include /api
+    ("documents", {"prefix": "/api", "tags": ["Documents"]}),
+    ("scraping", {"tags": ["Web Scraping"]}),
+    ("file_upload", {"tags": ["File Upload & Analysis"]}),
+    ("cgpa", {"tags": ["CGPA"]}),
+    ("attendance", {"tags": ["Attendance"]}),
+    ("profile", {"tags": ["User Profile"]}),
+    ("knowledge_base", {"tags": ["Knowledge Base"]}),
+]
+
+for _name, _kwargs in _ROUTERS:
+    try:
+        _module = importlib.import_module(f"app.routes.{_name}")
+    except ImportError as _exc:
+        logger.warning(f"⚠️ Router {_name} not loaded: {_exc}")
+        continue
+    app.include_router(_module.router, **_kwargs)
 
 
 if __name__ == "__main__":
+    # uvloop + httptools buy 10-20% throughput on the fast endpoints; fall
+    # back to uvicorn's defaults where uvloop isn't available (e.g. Windows)
+    try:
+        import uvloop  # noqa: F401
+        loop_impl = "uvloop"
+    except ImportError:
+        loop_impl = "auto"
+
     uvicorn.run(
         "main:app",
         host=settings.HOST,
         port=settings.PORT,
         reload=False,  # Disabled reload to avoid import issues with ML packages
+        loop=loop_impl,
+        http="httptools",
         log_level="info"
     )